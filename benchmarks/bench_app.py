@@ -0,0 +1,474 @@
+# Headless benchmark of every dashboard view, driven through Streamlit's
+# AppTest.
+#
+#   python benchmarks/bench_app.py [--scales 1 10 100] [--views Laadpaaldata ...]
+#                                  [--out bench_app.json] [--compare old.json]
+#                                  [--no-startup]
+#
+# The bundled datasets are repeated `scale` times into bench_data/scale_N
+# (built once). Every (scale, view) runs in its own process: the first run
+# opens the view cold, then the view's scripted slider/select sequence is
+# replayed. Time is attributed to five stages by wrapping the functions
+# that do the work:
+#
+#   load        data_loader, shared_store, session feed, GeoJSON levels
+#   filter      range index queries and builds, clustering, model rows
+#   aggregate   count cubes, popularity index, per-brand artifacts,
+#               municipality join
+#   render      figures to PNG, folium layers
+#   serialize   st.image/st.dataframe/st_folium and the protobuf messages
+#               the server would send
+#
+# Nested calls count for the innermost stage only; the rest of a run is
+# "other". Per stage: wall time, peak RSS (high-water mark reset around
+# every call through /proc/self/clear_refs, else the process maximum) and
+# payload bytes (size of what the stage produced or sent). Results go to
+# a JSON file together with the commit, so two runs can be compared with
+# --compare.
+#
+# Startup: at the smallest scale every view is also opened once in a fresh
+# `python -X importtime` process, as a new server worker would. Reported
+# are the first run (time to first paint) and the imports it triggered,
+# per top-level package. What Streamlit and AppTest import up front is
+# loaded before the run and not counted.
+#
+# The vehicle export comes from elektrischeautos5.csv in the repository
+# or the fetch.py cache. Without one it is derived from the bundled
+# elektrischeautos3.xlsx, with a jaar column and a synthetic, seeded
+# massa_rijklaar.
+
+import argparse
+import atexit
+import datetime
+import functools
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VIEWS = ["Openchargemap", "Laadpaaldata", "Elektrische autos"]
+SCALED = ["fd2.csv", "gdf_points.csv", "elektrischeautos5.csv"]
+COPIED = ["df_muni.csv", "gdf_munis.csv"]
+
+STAGES = {
+    "load": ["data_loader.load_openchargemap", "data_loader.load_sessions", "data_loader.read_table",
+             "shared_store.shared_frame", "session_feed.SessionFeed.refresh",
+             "choropleth._level_features"],
+    "filter": ["range_index.SortedRangeIndex.__init__", "range_index.SortedRangeIndex.positions",
+               "range_index.SortedRangeIndex.filter", "clustering.ClusterIndex.__init__",
+               "clustering.ClusterIndex.query", "popularity.ModelPopularity.popular_rows",
+               "popularity.ModelPopularity.brand_rows"],
+    "aggregate": ["cubes.CountCube.from_frame", "cubes.CountCube.query",
+                  "popularity.ModelPopularity.__init__", "brand_jobs.BrandJobs.result",
+                  "spatial_join.MunicipalityJoin.__init__", "spatial_join.MunicipalityJoin.aggregate"],
+    "render": ["figure_cache.cached_figure", "markers.marker_layer", "choropleth.choropleth_layer"],
+    "serialize": ["streamlit.image", "streamlit.dataframe", "streamlit_folium.st_folium"],
+}
+
+# view -> [(step, widget, index, value)]; slider values are fractions of
+# the slider range, selectbox values option positions
+SCRIPTS = {
+    "Openchargemap": [
+        ("vermogen 10-50%", "slider", 0, (0.1, 0.5)),
+        ("vermogen alles", "slider", 0, (0.0, 1.0)),
+    ],
+    "Laadpaaldata": [
+        ("wattage 25-75%", "slider", 0, (0.25, 0.75)),
+        ("uren 8-18", "slider", 1, (8 / 23, 18 / 23)),
+        ("wattage alles", "slider", 0, (0.0, 1.0)),
+    ],
+    "Elektrische autos": [
+        ("prijs 0-30%", "slider", 0, (0.0, 0.3)),
+        ("toelating tweede helft", "slider", 1, (0.5, 1.0)),
+        ("snelheid 20-80%", "slider", 2, (0.2, 0.8)),
+        ("merk", "selectbox", 0, 1),
+        ("drempel", "slider", 3, 0.2),
+    ],
+}
+
+
+# Datasets
+
+def vehicle_csv(target):
+    from fetch import CACHE_DIR, cached_versions
+
+    candidates = [os.path.join(ROOT, "elektrischeautos5.csv")]
+    cache = os.path.join(ROOT, CACHE_DIR)
+    candidates += [os.path.join(cache, v, "elektrischeautos5.csv") for v in cached_versions(cache)]
+    for path in candidates:
+        if os.path.exists(path):
+            shutil.copyfile(path, target)
+            return
+    frame = pd.read_excel(os.path.join(ROOT, "elektrischeautos3.xlsx"))
+    toelating = pd.to_datetime(frame["datum_eerste_toelating"])
+    frame["jaar"] = toelating.dt.year
+    rng = np.random.default_rng(0)
+    frame["massa_rijklaar"] = rng.normal(1900, 350, len(frame)).clip(800, 3500).round().astype(int)
+    for col in ["datum_eerste_tenaamstelling_in_nederland", "datum_eerste_toelating", "datum_tenaamstelling"]:
+        frame[col] = pd.to_datetime(frame[col]).dt.strftime("%Y-%m-%d")
+    frame.to_csv(target, index=False)
+
+
+def scaled_dir(data_dir, scale, convert):
+    # bench_data/scale_N with every dataset repeated `scale` times
+    target = os.path.join(data_dir, f"scale_{scale}")
+    if os.path.exists(os.path.join(target, "complete")):
+        return target
+    os.makedirs(target, exist_ok=True)
+    vehicles = os.path.join(data_dir, "elektrischeautos5.csv")
+    if not os.path.exists(vehicles):
+        vehicle_csv(vehicles)
+    for name in SCALED:
+        source = vehicles if name == "elektrischeautos5.csv" else os.path.join(ROOT, name)
+        with open(source, "rb") as f:
+            header = f.readline()
+            body = f.read()
+        if not body.endswith(b"\n"):
+            body += b"\n"
+        with open(os.path.join(target, name), "wb") as f:
+            f.write(header)
+            for _ in range(scale):
+                f.write(body)
+    for name in COPIED:
+        shutil.copyfile(os.path.join(ROOT, name), os.path.join(target, name))
+    if convert:
+        subprocess.run([sys.executable, os.path.join(ROOT, "convert_data.py"), "--base-dir", target],
+                       check=True, stdout=subprocess.DEVNULL)
+    open(os.path.join(target, "complete"), "w").close()
+    return target
+
+
+# Stage recording
+
+def payload(value):
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(payload(v) for v in value if not isinstance(v, (tuple, list)))
+    return 0
+
+
+def _reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _rss():
+    # (current, peak) resident set size in bytes
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return peak, peak
+
+
+class StageRecorder:
+
+    def __init__(self):
+        self.stack = []  # [stage, start, child seconds, child peak] per open call
+        self.reset()
+
+    def reset(self):
+        self.stages = defaultdict(lambda: {"seconds": 0.0, "peak_rss": 0, "bytes": 0, "calls": 0})
+
+    def record(self, stage, seconds, peak, nbytes):
+        entry = self.stages[stage]
+        entry["seconds"] += seconds
+        entry["peak_rss"] = max(entry["peak_rss"], peak)
+        entry["bytes"] += nbytes
+        entry["calls"] += 1
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            call = [stage, time.perf_counter(), 0.0, 0]
+            self.stack.append(call)
+            _reset_peak()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                elapsed = time.perf_counter() - call[1]
+                self.stack.pop()
+                peak = max(call[3], _rss()[1])
+                _reset_peak()
+                sent = args[0] if stage == "serialize" and args else result
+                self.record(stage, elapsed - call[2], peak, payload(sent))
+                if self.stack:
+                    self.stack[-1][2] += elapsed
+                    self.stack[-1][3] = max(self.stack[-1][3], peak)
+        return wrapper
+
+    def install(self):
+        import importlib
+
+        for stage, targets in STAGES.items():
+            for target in targets:
+                module_name, _, rest = target.partition(".")
+                owner = importlib.import_module(module_name)
+                *classes, attr = rest.split(".")
+                for name in classes:
+                    owner = getattr(owner, name)
+                raw = inspect.getattr_static(owner, attr)
+                if isinstance(raw, classmethod):
+                    setattr(owner, attr, classmethod(self.wrap(stage, raw.__func__)))
+                else:
+                    setattr(owner, attr, self.wrap(stage, raw))
+        self._install_messages()
+
+    def _install_messages(self):
+        # Protobuf bytes the server would send for a run, and the time to
+        # encode them
+        from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+        forward_msgs = LocalScriptRunner.forward_msgs
+
+        def recorded(runner):
+            messages = forward_msgs(runner)
+            start = time.perf_counter()
+            size = sum(len(message.SerializeToString()) for message in messages)
+            self.record("serialize", time.perf_counter() - start, _rss()[1], size)
+            return messages
+
+        LocalScriptRunner.forward_msgs = recorded
+
+
+# Startup
+
+FIRST_RUN = "bench_app: first run"
+STARTUP_SCRIPT = f"""
+import json, sys, time
+# keep multiprocessing children (resource tracker, brand job workers) out
+# of the import log: they copy their interpreter options from here
+sys._xoptions.pop("importtime", None)
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=1800)
+at.session_state["view"] = sys.argv[2]
+print({FIRST_RUN!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+at.run()
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def import_times(stderr):
+    # seconds per top-level package imported after the FIRST_RUN marker,
+    # from -X importtime lines: "import time: self | cumulative | name"
+    lines = stderr.splitlines()
+    lines = lines[lines.index(FIRST_RUN) + 1:] if FIRST_RUN in lines else []
+    packages = defaultdict(float)
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit() or name[1:2] == " ":
+            continue  # header line or nested import
+        packages[name.strip().split(".")[0]] += int(cumulative) / 1e6
+    return dict(sorted(packages.items(), key=lambda item: -item[1]))
+
+
+def startup(view, scale, data_dir):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.pop("DASHBOARD_DATA_SOURCE", None)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT,
+                             os.path.join(ROOT, "app.py"), view],
+                            cwd=data_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{view} startup failed:\n{result.stderr[-2000:]}")
+    first = json.loads(result.stdout.strip().splitlines()[-1])
+    packages = import_times(result.stderr)
+    return {"scale": scale, "view": view, "seconds": first["seconds"],
+            "imports": sum(packages.values()), "packages": packages, "errors": first["errors"]}
+
+
+# Runs
+
+def _slider_value(slider, fraction):
+    # AppTest exposes the bounds as protobuf numbers (dates in microseconds
+    # since the epoch); the value keeps the widget's own type
+    low, high, step = slider.min, slider.max, slider.step
+    current = slider.value
+    sample = current[0] if isinstance(current, (tuple, list)) else current
+
+    def at(f):
+        value = low + round((high - low) * f / step) * step if step else low + (high - low) * f
+        value = min(max(value, low), high)
+        if isinstance(sample, (datetime.date, datetime.datetime)):
+            moment = datetime.datetime.fromtimestamp(value / 1e6, datetime.timezone.utc).replace(tzinfo=None)
+            return moment if isinstance(sample, datetime.datetime) else moment.date()
+        return type(sample)(value)
+
+    if isinstance(fraction, tuple):
+        return tuple(at(f) for f in fraction)
+    return at(fraction)
+
+
+def run_view(view, scale, data_dir, results):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.pop("DASHBOARD_DATA_SOURCE", None)
+    os.chdir(data_dir)
+    recorder = StageRecorder()
+    recorder.install()
+    rows = []
+
+    def step(name, action):
+        recorder.reset()
+        _reset_peak()
+        start = time.perf_counter()
+        action()
+        seconds = time.perf_counter() - start
+        stages = dict(recorder.stages)
+        stages["other"] = {"seconds": max(seconds - sum(s["seconds"] for s in stages.values()), 0.0)}
+        rss, peak = _rss()
+        rows.append({"scale": scale, "view": view, "step": name, "seconds": seconds,
+                     "rss": rss, "peak_rss": max([peak] + [s.get("peak_rss", 0) for s in stages.values()]),
+                     "stages": stages, "errors": [str(e.value) for e in at.exception]})
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=1800)
+    at.session_state["view"] = view
+    step("open", at.run)
+    for name, widget, index, value in SCRIPTS[view]:
+        element = getattr(at, widget)[index]
+        if widget == "slider":
+            value = _slider_value(element, value)
+        else:
+            value = element.options[min(value, len(element.options) - 1)]
+        step(name, lambda: element.set_value(value).run())
+    results.put(rows)
+    # a multiprocessing worker skips atexit: join the brand job pool and
+    # unlink the shared memory blocks here
+    from brand_jobs import jobs
+
+    jobs.shutdown(wait=True)
+    atexit._run_exitfuncs()
+
+
+def run(view, scale, data_dir):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    worker = context.Process(target=run_view, args=(view, scale, data_dir, results))
+    worker.start()
+    while True:
+        try:
+            rows = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not worker.is_alive():
+                raise RuntimeError(f"{view} at scale {scale} failed (exit code {worker.exitcode})")
+    worker.join()
+    return rows
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_rows(rows):
+    print(f"{'scale':>5} {'view':<18} {'step':<24} {'total':>8} "
+          + " ".join(f"{stage:>9}" for stage in list(STAGES) + ["other"]) + f" {'peak RSS':>9}")
+    for row in rows:
+        stages = " ".join(f"{row['stages'].get(stage, {}).get('seconds', 0) * 1000:>7.0f}ms"
+                          for stage in list(STAGES) + ["other"])
+        print(f"{row['scale']:>5} {row['view']:<18} {row['step']:<24} {row['seconds'] * 1000:>6.0f}ms "
+              f"{stages} {row['peak_rss'] / 1e6:>7.0f}MB" + (" ERROR" if row["errors"] else ""))
+
+
+def print_startup(rows):
+    print(f"\n{'scale':>5} {'view':<18} {'first run':>10} {'imports':>8}  largest imports")
+    for row in rows:
+        largest = ", ".join(f"{name} {seconds * 1000:.0f}ms"
+                            for name, seconds in list(row["packages"].items())[:5])
+        print(f"{row['scale']:>5} {row['view']:<18} {row['seconds'] * 1000:>8.0f}ms "
+              f"{row['imports'] * 1000:>6.0f}ms  {largest}" + (" ERROR" if row["errors"] else ""))
+
+
+def compare(rows, startup_rows, path):
+    with open(path) as f:
+        previous = json.load(f)
+    old = {(r["scale"], r["view"], r["step"]): r for r in previous["runs"]}
+    print(f"\nvs {path}: time ratio new/old (< 1 is faster)")
+    for row in rows:
+        before = old.get((row["scale"], row["view"], row["step"]))
+        if before is None:
+            continue
+        ratios = {stage: row["stages"].get(stage, {}).get("seconds", 0) / before["stages"][stage]["seconds"]
+                  for stage in list(STAGES) + ["other"]
+                  if before["stages"].get(stage, {}).get("seconds", 0) > 0}
+        print(f"{row['scale']:>5} {row['view']:<18} {row['step']:<24} "
+              f"{row['seconds'] / before['seconds']:>5.2f}x  "
+              + " ".join(f"{stage} {ratio:.2f}x" for stage, ratio in ratios.items()))
+
+    old = {(r["scale"], r["view"]): r for r in previous.get("startup", [])}
+    for row in startup_rows:
+        before = old.get((row["scale"], row["view"]))
+        if before is not None and before["imports"] > 0:
+            print(f"{row['scale']:>5} {row['view']:<18} {'startup':<24} "
+                  f"{row['seconds'] / before['seconds']:>5.2f}x  "
+                  f"imports {row['imports'] / before['imports']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--views", nargs="+", choices=VIEWS, default=VIEWS)
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "bench_data"))
+    parser.add_argument("--convert", action="store_true", help="run convert_data.py on the scaled data")
+    parser.add_argument("--out", default="bench_app.json")
+    parser.add_argument("--compare", help="earlier --out file to compare with")
+    parser.add_argument("--no-startup", action="store_true", help="skip the import-time startup profile")
+    args = parser.parse_args()
+
+    rows = []
+    for scale in args.scales:
+        data_dir = scaled_dir(os.path.abspath(args.data_dir), scale, args.convert)
+        for view in args.views:
+            rows += run(view, scale, data_dir)
+    print_rows(rows)
+
+    startup_rows = []
+    if not args.no_startup:
+        scale = min(args.scales)
+        data_dir = scaled_dir(os.path.abspath(args.data_dir), scale, args.convert)
+        startup_rows = [startup(view, scale, data_dir) for view in args.views]
+        print_startup(startup_rows)
+
+    with open(args.out, "w") as f:
+        json.dump({"commit": commit(), "python": platform.python_version(),
+                   "converted": args.convert, "runs": rows, "startup": startup_rows}, f, indent=1)
+    print(f"\nresults written to {args.out}")
+    if args.compare:
+        compare(rows, startup_rows, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Compare seaborn's per-group KDE with the binned multi-group KDE used for
+# the handelsbenaming displot.
+#
+#   python benchmarks/bench_kde.py [--sizes 30000 300000] [--models 20]
+#
+# Synthetic registration dates: every model gets its own launch date and
+# spread, model sizes follow a Zipf-like distribution like a real brand's.
+# Both paths evaluate on the same 512-point grid with cut=3; the reported
+# error is the largest difference between the stacked "fill" fractions.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from seaborn._statistics import KDE  # noqa: E402
+
+from kde import binned_kde, fill_fractions  # noqa: E402
+
+GRID_SIZE = 512
+
+
+def synthetic_brand(n, models, seed=0):
+    rng = np.random.default_rng(seed)
+    share = 1 / np.arange(1, models + 1)
+    groups = rng.choice(models, size=n, p=share / share.sum())
+    launch = rng.uniform(16_000, 19_500, models)   # days since 1970
+    spread = rng.uniform(60, 900, models)
+    days = np.round(launch[groups] + np.abs(rng.normal(0, spread[groups])))
+    return days, groups
+
+
+def seaborn_fill(days, groups, models, grid):
+    # What displot(kind="kde", multiple="fill") computes: one fit per hue
+    # group on a common grid, scaled by the group's share
+    kde = KDE(cut=3, gridsize=len(grid))
+    kde.support = grid
+    curves = np.zeros((models, len(grid)))
+    lo, hi = np.full(models, np.inf), np.full(models, -np.inf)
+    for g in range(models):
+        x = days[groups == g]
+        if len(x) < 2:
+            continue
+        density, _ = kde(x)
+        curves[g] = density * len(x)
+        bw = np.sqrt(kde._fit(x).covariance.squeeze())
+        lo[g], hi[g] = x.min() - 3 * bw, x.max() + 3 * bw
+    return fill_fractions(curves, grid, lo, hi)
+
+
+def binned_fill(days, groups, models, grid):
+    curves, _, lo, hi = binned_kde(days, groups, models, grid)
+    return fill_fractions(curves, grid, lo, hi)
+
+
+def timed(run, *args):
+    start = time.perf_counter()
+    result = run(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[30_000, 300_000])
+    parser.add_argument("--models", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'seaborn':>10} {'binned':>9} {'speedup':>8} {'max |fill diff|':>16}")
+    for n in args.sizes:
+        days, groups = synthetic_brand(n, args.models)
+        grid = np.linspace(days.min() - 365, days.max() + 365, GRID_SIZE)
+        t0, (mask0, fill0) = timed(seaborn_fill, days, groups, args.models, grid)
+        t1, (mask1, fill1) = timed(binned_fill, days, groups, args.models, grid)
+        both = mask0 & mask1
+        error = np.abs(fill0[:, both[mask0]] - fill1[:, both[mask1]]).max()
+        print(f"{n:>9} {t0 * 1000:>8.0f}ms {t1 * 1000:>7.1f}ms {t0 / t1:>7.0f}x {error:>16.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Compare the per-row CircleMarker loop with the columnar GeoJSON path.
+#
+#   python benchmarks/bench_markers.py [--sizes 8000 80000 800000] [--render]
+#
+# Synthetic points are sampled (with replacement) from gdf_points.csv and
+# jittered a little so coordinates stay unique.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import folium  # noqa: E402
+from folium.plugins import MarkerCluster  # noqa: E402
+
+from markers import marker_layer  # noqa: E402
+
+
+def synthetic_points(n, seed=0):
+    base = pd.read_csv(os.path.join(ROOT, "gdf_points.csv"))
+    rng = np.random.default_rng(seed)
+    points = base.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    points["AddressInfo.Latitude"] += rng.normal(0, 0.001, n)
+    points["AddressInfo.Longitude"] += rng.normal(0, 0.001, n)
+    return points
+
+
+def row_loop(points):
+    # The original Openchargemap marker loop
+    m = folium.Map(location=[52.1, 5.3], zoom_start=8)
+    marker_cluster = MarkerCluster().add_to(m)
+    for _, row in points.iterrows():
+        tooltip = (
+            f"Postcode: {row['AddressInfo.Postcode']}<br>"
+            f"Town: {row['AddressInfo.Town']}<br>"
+            "Click for more"
+        )
+        popup = f"""
+        <i>Power KW:</i> <br> <b>{row['Conn_PowerKW']}</b> <br>
+        <i>Connection type:</i> <br> <b>{row['Conn_ConnectionType.Title']}</b> <br>
+        <i>Current type:</i> <br> <b>{row['Conn_CurrentType.Title']}</b> <br>
+        """
+        folium.CircleMarker(
+            location=[row["AddressInfo.Latitude"], row["AddressInfo.Longitude"]],
+            radius=4,
+            fill=True,
+            fill_opacity=0.8,
+            tooltip=tooltip,
+            popup=popup
+        ).add_to(marker_cluster)
+    return m
+
+
+def columnar(points):
+    m = folium.Map(location=[52.1, 5.3], zoom_start=8)
+    marker_layer(points).add_to(m)
+    return m
+
+
+def measure(build, points, render):
+    start = time.perf_counter()
+    m = build(points)
+    built = time.perf_counter() - start
+    if not render:
+        return built, None
+    page = m.get_root().render()
+    return time.perf_counter() - start, len(page.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8000, 80000, 800000])
+    parser.add_argument("--render", action="store_true",
+                        help="also render the page HTML and report its size")
+    args = parser.parse_args()
+
+    print(f"{'points':>8}  {'loop (s)':>9}  {'columnar (s)':>12}  {'speedup':>7}  {'html (MB)':>19}")
+    for n in args.sizes:
+        points = synthetic_points(n)
+        loop_s, loop_bytes = measure(row_loop, points, args.render)
+        col_s, col_bytes = measure(columnar, points, args.render)
+        sizes = ""
+        if args.render:
+            sizes = f"{loop_bytes / 1e6:.1f} -> {col_bytes / 1e6:.1f}"
+        print(f"{n:>8}  {loop_s:>9.2f}  {col_s:>12.3f}  {loop_s / col_s:>6.0f}x  {sizes:>19}")
+
+
+if __name__ == "__main__":
+    main()
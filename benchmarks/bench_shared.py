@@ -0,0 +1,98 @@
+# Memory of N processes reading the same dataset privately vs attaching
+# to one shared-memory copy (shared_store.py).
+#
+#   python benchmarks/bench_shared.py [--processes 8] [--scale 20]
+#
+# The charging sessions (fd2.csv) are repeated `scale` times. Each process
+# loads the frame, touches every column and reports how much memory it
+# holds privately and its proportional share of the shared pages (PSS),
+# both relative to an idle process (Linux /proc/self/smaps_rollup).
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_loader import read_table  # noqa: E402
+from shared_store import shared_frame  # noqa: E402
+
+
+def memory():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Private_Clean"] + fields["Private_Dirty"], fields["Pss"]
+
+
+def touch(values):
+    # Read one byte per page of a column's buffers without materialising it
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        buffers = [values.cat.codes.to_numpy()]
+    elif isinstance(values.dtype, np.dtype):
+        buffers = [values.to_numpy()]
+    else:
+        buffers = [b for chunk in values.array._pa_array.chunks for b in chunk.buffers() if b is not None]
+    return sum(int(np.frombuffer(b, dtype=np.uint8)[::4096].sum()) for b in buffers)
+
+
+def scaled_sessions(scale):
+    sessions = read_table("sessions", ROOT)
+    return pd.concat([sessions] * scale, ignore_index=True)
+
+
+def reader(mode, scale, barrier, results):
+    private0, pss0 = memory()
+    if mode == "private":
+        frame = scaled_sessions(scale)
+    else:
+        frame = shared_frame("bench_sessions", str(scale), lambda: scaled_sessions(scale))
+    for col in frame.columns:
+        touch(frame[col])
+    barrier.wait()  # measure while everyone holds the data
+    private, pss = memory()
+    results.put((private - private0, pss - pss0, int(frame.memory_usage(deep=True).sum())))
+    barrier.wait()
+
+
+def run(mode, processes, scale):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [context.Process(target=reader, args=(mode, scale, barrier, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    rows = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--scale", type=int, default=20)
+    args = parser.parse_args()
+
+    # Publish once up front, as the Streamlit server process would
+    owner = shared_frame("bench_sessions", str(args.scale), lambda: scaled_sessions(args.scale))
+    print(f"dataset: {owner.memory_usage(deep=True).sum() / 1e6:.1f} MB, {len(owner)} rows")
+
+    for mode in ("private", "shared"):
+        rows = run(mode, args.processes, args.scale)
+        private = sum(r[0] for r in rows) / 1e6
+        pss = sum(r[1] for r in rows) / 1e6
+        print(f"{mode:>8}: {args.processes} processes, private {private:.1f} MB, PSS {pss:.1f} MB total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from kde import binned_kde, fill_fractions
+from shared_store import shared_frame
+
+# Background precompute of the per-brand charts in the Elektrische autos view.
+#
+# Picking a brand used to run groupby().filter(lambda), a seaborn KDE per
+# model and a pivot_table in the script thread. When a filter state is
+# submitted, every `merk` in it becomes one job on a process pool that
+# uses all cores. A job gets the rows of the brand's models with more
+# than MODEL_FLOOR vehicles (popularity.ModelPopularity) and returns per
+# model the vehicle count, the KDE curve (kde.binned_kde) on a date grid
+# shared by all brands, and the model x jaar count table. The selectbox
+# only looks the result up, and select_models() applies the user's
+# threshold to it by indexing.
+#
+# The job inputs (model, date, year and weight columns) are published once
+# to shared memory with job_frame(); a job only receives its row
+# positions and attaches to that frame in the worker.
+#
+# Jobs are keyed on the same tuple as the chart cache (dataset version
+# and slider values). Results for a key that was never submitted are
+# computed inline with the same function, so both paths draw the same
+# chart. The registry keeps the last MAX_KEYS filter states plus one
+# pinned key (the view's initial state), which is never evicted, so moving
+# the sliders around does not make the pool redo the default precompute.
+# A job that fails in the worker is logged and then computed inline.
+
+MODEL_THRESHOLD = 50  # default minimum of vehicles per model
+MODEL_FLOOR = 10      # lowest threshold offered; jobs cover every model above it
+GRID_SIZE = 512
+MAX_KEYS = 4          # filter states kept in the registry
+
+DAY_NS = 86_400 * 10 ** 9
+
+logger = logging.getLogger(__name__)
+
+
+def date_days(values):
+    # Datetimes as float days since 1970 (matplotlib date numbers), NaT -> NaN
+    values = np.asarray(values, dtype="datetime64[ns]")
+    days = values.astype("int64") / DAY_NS
+    days[np.isnat(values)] = np.nan
+    return days
+
+
+def date_grid(days, size=GRID_SIZE):
+    # Shared evaluation grid over all registration dates, padded a year
+    days = days[np.isfinite(days)]
+    if len(days) == 0:
+        return np.zeros(0)
+    return np.linspace(days.min() - 365, days.max() + 365, size)
+
+
+def brand_artifact(models, days, years, weights, grid):
+    # Vehicle counts, KDE curves and model x jaar counts for every model
+    # in the rows given
+    models = np.asarray(models, dtype=object)
+    weights = np.ones(len(models)) if weights is None else np.asarray(weights, dtype="float64")
+    codes, names = pd.factorize(models, sort=True)
+
+    # All models' KDEs in one binned pass on the shared grid
+    curves, _, lo, hi = binned_kde(days, codes, len(names), grid, weights)
+
+    # pivot_table(index=handelsbenaming, columns=jaar) over dated rows
+    counted = np.isfinite(days) & np.isfinite(years)
+    table = pd.Series(weights[counted]).groupby(
+        [models[counted], years[counted].astype("int64")]).sum().unstack()
+    table = table.rename_axis(index="handelsbenaming", columns="jaar")
+
+    return {
+        "models": np.asarray(names, dtype=object),
+        "counts": np.bincount(codes, weights, minlength=len(names)),
+        "curves": curves, "lo": lo, "hi": hi, "grid": grid, "table": table,
+    }
+
+
+def select_models(artifact, threshold=MODEL_THRESHOLD):
+    # Models with more than `threshold` vehicles, their KDE fill fractions
+    # and their rows of the model x jaar table
+    keep = artifact["counts"] > threshold
+    models = artifact["models"][keep].tolist()
+    support, fractions = fill_fractions(
+        artifact["curves"][keep], artifact["grid"], artifact["lo"][keep], artifact["hi"][keep])
+    table = artifact["table"]
+    return {
+        "models": models,
+        "grid": artifact["grid"][support],
+        "fractions": fractions,
+        "table": table[table.index.isin(models)],
+    }
+
+
+def job_frame(frame):
+    # brand_artifact's input columns, compact enough to share with workers
+    columns = {
+        "handelsbenaming": frame["handelsbenaming"].array,
+        "days": date_days(frame["datum_eerste_toelating"]),
+        "jaar": frame["jaar"].to_numpy("float64", na_value=np.nan),
+    }
+    if "aantal" in frame.columns:
+        columns["aantal"] = frame["aantal"].to_numpy("float64")
+    return pd.DataFrame(columns)
+
+
+def brand_inputs(frame, rows):
+    # brand_artifact arguments (without the grid) for the row positions `rows`
+    models = frame["handelsbenaming"]
+    return (
+        np.asarray(models.cat.categories, dtype=object)[models.cat.codes.to_numpy()[rows]],
+        frame["days"].to_numpy()[rows],
+        frame["jaar"].to_numpy()[rows],
+        frame["aantal"].to_numpy()[rows] if "aantal" in frame.columns else None,
+    )
+
+
+def shared_brand_artifact(name, version, rows, grid):
+    # Worker side: attach to the published job frame, no copy of the data
+    return brand_artifact(*brand_inputs(shared_frame(name, version), rows), grid)
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class BrandJobs:
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._jobs = {}
+        self._pinned = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn: forking the multi-threaded Streamlit server is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _key_jobs(self, key):
+        # Caller holds the lock; evicts the oldest filter states past
+        # MAX_KEYS, never the pinned one
+        if key not in self._jobs:
+            self._jobs[key] = {}
+            evictable = [k for k in self._jobs if k != self._pinned]
+            for oldest in evictable[:max(0, len(evictable) - MAX_KEYS)]:
+                for future in self._jobs.pop(oldest).values():
+                    future.cancel()
+        return self._jobs[key]
+
+    def submitted(self, key):
+        with self._lock:
+            return key in self._jobs
+
+    def submit(self, key, grid, source, rows, pin=False):
+        # Queue one job per brand; `source` is the (name, version) of a
+        # shared job_frame and `rows` maps merk -> its row positions.
+        # pin=True keeps `key` out of eviction (replacing an earlier pin)
+        with self._lock:
+            if pin:
+                self._pinned = key
+            jobs = self._key_jobs(key)
+            pool = self._executor()
+            for merk, positions in rows.items():
+                if merk not in jobs:
+                    jobs[merk] = pool.submit(shared_brand_artifact, *source, positions, grid)
+
+    def result(self, key, merk, grid, inputs):
+        # Artifact for `merk` under `key`; waits for a queued job, computes
+        # it inline from `inputs()` when the brand was not submitted
+        with self._lock:
+            future = self._jobs.get(key, {}).get(merk)
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass  # evicted or shut down before it ran
+            except Exception:
+                logger.warning("brand job for %r failed, computing it inline", merk, exc_info=True)
+        artifact = brand_artifact(*inputs(), grid)
+        with self._lock:
+            self._key_jobs(key)[merk] = _done(artifact)
+        return artifact
+
+    def shutdown(self, wait=False):
+        # wait=True also joins the worker processes (needed when the
+        # caller is itself a multiprocessing child, which skips atexit)
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+            self._jobs.clear()
+            self._pinned = None
+
+
+jobs = BrandJobs()
+atexit.register(jobs.shutdown)
+
+
+if __name__ == "__main__":
+    # python brand_jobs.py -> inline vs pooled precompute of every brand
+    import time
+
+    from data_loader import read_table, table_version
+    from popularity import ModelPopularity
+
+    frame = read_table("vehicles_xlsx")
+    frame["jaar"] = frame["datum_eerste_toelating"].dt.year
+    source = ("vehicle_jobs", table_version("vehicles_xlsx"))
+    inputs = shared_frame(*source, lambda: job_frame(frame))
+    grid = date_grid(inputs["days"].to_numpy())
+    rows = ModelPopularity(frame).brand_rows(MODEL_FLOOR)
+
+    start = time.perf_counter()
+    for merk, positions in rows.items():
+        BrandJobs().result(("inline",), merk, grid, lambda: brand_inputs(inputs, positions))
+    print(f"inline: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    jobs.submit(("pool",), grid, source, rows)
+    for merk, positions in rows.items():
+        jobs.result(("pool",), merk, grid, lambda: brand_inputs(inputs, positions))
+    print(f"pool ({jobs.workers} workers): {(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,106 @@
+import numpy as np
+
+# Plot helpers that seaborn does not cover for the dashboard's data.
+
+
+def weighted_quantiles(values, weights, quantiles):
+    order = np.argsort(values, kind="stable")
+    values = np.asarray(values, dtype="float64")[order]
+    cumulative = np.cumsum(np.asarray(weights, dtype="float64")[order])
+    positions = np.asarray(quantiles) * cumulative[-1]
+    index = np.searchsorted(cumulative, positions, side="left")
+    return values[np.minimum(index, len(values) - 1)]
+
+
+def weighted_box_stats(values, weights, label):
+    # Box statistics as Axes.bxp expects them, for values that each stand
+    # for `weights` observations (whiskers at 1.5 IQR, no fliers)
+    valid = np.isfinite(values) & (weights > 0)
+    values, weights = values[valid], weights[valid]
+    if len(values) == 0:
+        return None
+    q1, med, q3 = weighted_quantiles(values, weights, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "label": label,
+        "med": med,
+        "q1": q1,
+        "q3": q3,
+        "whislo": inside.min(),
+        "whishi": inside.max(),
+        "fliers": [],
+    }
+
+
+def weighted_boxplot(df, x, y, weight, ax):
+    # sns.boxplot equivalent for pre-aggregated rows carrying a count column
+    stats = []
+    for label, group in df.groupby(x, observed=True, sort=True):
+        box = weighted_box_stats(group[y].to_numpy("float64"), group[weight].to_numpy("float64"), label)
+        if box is not None:
+            stats.append(box)
+    if stats:
+        ax.bxp(stats, showfliers=False, patch_artist=True,
+               boxprops={"facecolor": "#4c72b0", "alpha": 0.8},
+               medianprops={"color": "white"})
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    return ax
+
+
+# Rasterised scatter
+#
+# Above RASTER_THRESHOLD points a scatter plot is drawn as an image: the
+# points are binned onto a fixed pixel grid with NumPy and each cell is
+# shaded by its count or by the mean of a value column. Drawing cost then
+# depends on the grid size, not on the number of points.
+
+RASTER_THRESHOLD = 20_000
+RASTER_BINS = (480, 240)
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        import matplotlib.dates as mdates
+        return mdates.date2num(values), True
+    return values.astype("float64"), False
+
+
+def rasterized_scatter(x, y, ax, values=None, weights=None, bins=RASTER_BINS,
+                       cmap="viridis", label=None):
+    # Shade by point count, or by the (weighted) mean of `values` per cell
+    x, x_dates = _numeric(x)
+    y, _ = _numeric(y)
+    valid = np.isfinite(x) & np.isfinite(y)
+    weights = np.ones(len(x)) if weights is None else np.asarray(weights, dtype="float64")
+    if values is not None:
+        values = np.asarray(values, dtype="float64")
+        valid &= np.isfinite(values)
+    x, y, weights = x[valid], y[valid], weights[valid]
+    if len(x) == 0:
+        return None
+
+    extent = [x.min(), x.max(), y.min(), y.max()]
+    if extent[0] == extent[1]:
+        extent[1] += 1
+    if extent[2] == extent[3]:
+        extent[3] += 1
+    bin_range = [extent[:2], extent[2:]]
+
+    counts, _, _ = np.histogram2d(x, y, bins=bins, range=bin_range, weights=weights)
+    if values is None:
+        grid = counts
+        label = label or "aantal"
+    else:
+        sums, _, _ = np.histogram2d(x, y, bins=bins, range=bin_range, weights=values[valid] * weights)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            grid = sums / counts
+
+    image = ax.imshow(np.ma.masked_where(counts.T == 0, grid.T), origin="lower", extent=extent,
+                      aspect="auto", cmap=cmap, interpolation="nearest")
+    ax.figure.colorbar(image, ax=ax, label=label)
+    if x_dates:
+        ax.xaxis_date()
+    return image
@@ -0,0 +1,180 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_loader import cached
+from profiling import timed
+
+# Pre-simplified municipality outlines for the choropleth.
+#
+# `python choropleth.py build` simplifies gdf_munis.csv once per level of
+# detail and writes compact GeoJSON files to geo_cache/. Shared borders
+# between municipalities are simplified together (coverage simplification),
+# so neighbouring polygons stay gap-free. At runtime the dashboard only
+# reads the level for the current zoom, parsed once per process; shapely
+# is not touched on the request path.
+#
+# joined_geojson() puts per-municipality values into the features'
+# properties, matched on GID_2 by index alignment, and choropleth_layer()
+# colours them from a fill colour computed for all values at once. The
+# layer is a plain folium.GeoJson: folium.Choropleth looked every feature
+# up in the data by name at render time, and left a municipality blank
+# whenever the names did not match exactly.
+
+CACHE_DIR = "geo_cache"
+SOURCE = "gdf_munis.csv"
+
+# Minimum map zoom -> simplification tolerance (degrees), about half a
+# screen pixel at that zoom
+LEVELS = {
+    0: 0.02,
+    7: 0.005,
+    9: 0.0015,
+    11: 0.0004,
+}
+
+# Only what the choropleth needs for joining and tooltips
+PROPERTIES = ["GID_2", "NAME_1", "NAME_2"]
+PRECISION = 4
+
+NAN_FILL = "lightgrey"  # municipalities without a value
+
+
+def level_for_zoom(zoom):
+    return max(level for level in LEVELS if level <= max(zoom, 0))
+
+
+def level_path(level, base_dir="."):
+    return os.path.join(base_dir, CACHE_DIR, f"munis_z{level}.geojson")
+
+
+def _rounded(coords):
+    if isinstance(coords[0], (float, int)):
+        return [round(c, PRECISION) for c in coords]
+    return [_rounded(c) for c in coords]
+
+
+def build(base_dir="."):
+    import geopandas as gpd
+    import shapely
+
+    munis = pd.read_csv(os.path.join(base_dir, SOURCE))
+    geometry = gpd.GeoSeries.from_wkt(munis["geometry"]).values
+    properties = munis[PROPERTIES].to_dict(orient="records")
+
+    os.makedirs(os.path.join(base_dir, CACHE_DIR), exist_ok=True)
+    written = {}
+    for level, tolerance in LEVELS.items():
+        if hasattr(shapely, "coverage_simplify"):
+            simplified = shapely.coverage_simplify(geometry, tolerance)
+        else:
+            simplified = shapely.simplify(geometry, tolerance, preserve_topology=True)
+
+        features = []
+        for props, geom in zip(properties, simplified):
+            shape = shapely.geometry.mapping(geom)
+            features.append({
+                "type": "Feature",
+                "properties": props,
+                "geometry": {"type": shape["type"], "coordinates": _rounded(shape["coordinates"])},
+            })
+        text = json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+
+        path = level_path(level, base_dir)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        written[level] = len(text)
+    return written
+
+
+def _ensure_built(base_dir):
+    source = os.path.join(base_dir, SOURCE)
+    paths = [level_path(level, base_dir) for level in LEVELS]
+    if (not all(os.path.exists(p) for p in paths)
+            or min(os.path.getmtime(p) for p in paths) < os.path.getmtime(source)):
+        build(base_dir)
+
+
+@timed("load")
+def _level_features(zoom, base_dir):
+    # Properties and geometry per feature of a level, indexed by GID_2;
+    # parsed once per level file
+    _ensure_built(base_dir)
+    path = level_path(level_for_zoom(zoom), base_dir)
+
+    def parse():
+        with open(path, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        properties = pd.DataFrame([feature["properties"] for feature in features])
+        properties["geometry"] = [feature["geometry"] for feature in features]
+        return properties.set_index("GID_2", drop=False)
+
+    return cached(("munis_features", path), [path], parse)
+
+
+def joined_geojson(zoom, values, key="GID_2", base_dir="."):
+    # FeatureCollection for `zoom` with the columns of `values` (one row
+    # per `key`) added to the properties, None for municipalities without
+    # a row. A dict: folium embeds it as is instead of parsing text again.
+    # The geometries are shared between calls and must not be modified.
+    features = _level_features(zoom, base_dir)
+    values = values.drop_duplicates(key).set_index(key)
+    properties = features[PROPERTIES].join(
+        values.drop(columns=[c for c in PROPERTIES if c in values.columns]), how="left")
+    properties = properties.astype(object).where(properties.notna(), None)
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": props, "geometry": geometry}
+        for props, geometry in zip(properties.to_dict(orient="records"), features["geometry"])]}
+
+
+def fill_colors(values, palette="BuPu", bins=6):
+    # (fill colour per value, None for NaN; bin edges; colours) with
+    # equal-width bins between the smallest and largest value
+    from branca.utilities import color_brewer
+
+    values = np.asarray(values, dtype="float64")
+    finite = values[np.isfinite(values)]
+    low, high = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    edges = np.linspace(low, max(high, low + 1e-9), bins + 1)
+    colors = color_brewer(palette, bins)
+    bin_of = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    fills = np.where(np.isfinite(values), np.asarray(colors, dtype=object)[bin_of], None)
+    return fills, edges, colors
+
+
+@timed("render")
+def choropleth_layer(values, column, zoom, tooltip=None, palette="BuPu", bins=6, base_dir="."):
+    # (folium GeoJson layer, legend) colouring the municipalities by
+    # `column` of `values` (GID_2 plus any columns for the tooltip);
+    # `tooltip` maps property names to labels
+    import folium
+    from branca.colormap import StepColormap
+
+    fills, edges, colors = fill_colors(values[column], palette, bins)
+    layer = folium.GeoJson(
+        joined_geojson(zoom, values.assign(fill=fills), base_dir=base_dir),
+        name=column,
+        style_function=lambda feature: {
+            "fillColor": feature["properties"]["fill"] or NAN_FILL,
+            "fillOpacity": 0.7,
+            "color": "black",
+            "weight": 1,
+            "opacity": 0.3,
+        },
+        tooltip=folium.GeoJsonTooltip(list(tooltip), aliases=list(tooltip.values())) if tooltip else None,
+    )
+    legend = StepColormap(colors, index=edges, vmin=edges[0], vmax=edges[-1], caption=column)
+    return layer, legend
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["build"]:
+        sys.exit("usage: python choropleth.py build [data dir]")
+    base_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    for level, size in build(base_dir).items():
+        print(f"zoom >= {level:>2}: {size / 1024:.0f} KiB")
@@ -0,0 +1,98 @@
+import numpy as np
+
+# Server-side marker clustering.
+#
+# Instead of sending every charger to the browser and letting
+# MarkerCluster group them there, the points are snapped once to a grid
+# pyramid in web-mercator space (one grid per zoom level, like map tiles).
+# Each level stores its clusters sorted by latitude, so a viewport query is
+# two binary searches plus a longitude mask on a narrow slice. The number
+# of clusters returned depends on the viewport size in pixels, not on the
+# number of chargers.
+
+MIN_ZOOM = 0
+MAX_ZOOM = 18
+CELL_PX = 60  # cluster cell size in screen pixels
+TILE_PX = 256
+
+
+def _mercator(lat, lon):
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = (lon + 180.0) / 360.0
+    rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(rad) + 1.0 / np.cos(rad)) / np.pi) / 2.0
+    return x, y
+
+
+class ClusterIndex:
+
+    def __init__(self, lat, lon, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, cell_px=CELL_PX):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        self.positions = np.flatnonzero(valid)
+        self.lat = lat[valid]
+        self.lon = lon[valid]
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels = {}
+
+        x, y = _mercator(self.lat, self.lon)
+        for zoom in range(min_zoom, max_zoom + 1):
+            cells = 2 ** zoom * TILE_PX / cell_px
+            cx = np.floor(x * cells).astype("int64")
+            cy = np.floor(y * cells).astype("int64")
+            self.levels[zoom] = self._build_level(cx * (int(cells) + 1) + cy)
+
+    def _build_level(self, keys):
+        _, first, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True)
+        lat = np.bincount(inverse, weights=self.lat) / counts
+        lon = np.bincount(inverse, weights=self.lon) / counts
+        # Single-point clusters keep a reference to their source row
+        point = np.where(counts == 1, self.positions[first], -1)
+
+        order = np.argsort(lat, kind="stable")
+        return {
+            "lat": lat[order],
+            "lon": lon[order],
+            "count": counts[order],
+            "point": point[order],
+        }
+
+    def __len__(self):
+        return len(self.lat)
+
+    def query(self, bounds, zoom):
+        # bounds: (south, west, north, east) in degrees
+        # Returns a dict of equal-length arrays: lat, lon, count, point.
+        # `point` is the row position of a lone charger, or -1 for a cluster.
+        zoom = int(min(max(round(zoom), self.min_zoom), self.max_zoom))
+        level = self.levels[zoom]
+        south, west, north, east = bounds
+
+        lo = np.searchsorted(level["lat"], south, side="left")
+        hi = np.searchsorted(level["lat"], north, side="right")
+        lon = level["lon"][lo:hi]
+        if west <= east:
+            mask = (lon >= west) & (lon <= east)
+        else:
+            # viewport crosses the antimeridian
+            mask = (lon >= west) | (lon <= east)
+
+        return {key: values[lo:hi][mask] for key, values in level.items()}
+
+
+def bounds_from_st_folium(bounds, default):
+    # Convert the `bounds` dict returned by st_folium to (south, west, north, east)
+    try:
+        south_west = bounds["_southWest"]
+        north_east = bounds["_northEast"]
+        return (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    except (KeyError, TypeError):
+        return default
+
+
+def cluster_radius(count):
+    # Marker radius in pixels, growing slowly with the cluster size
+    return np.clip(6 + 3 * np.log2(np.maximum(count, 1)), 6, 30)
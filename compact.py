@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Memory-compact dtypes for the dashboard frames.
+#
+# compact_frame() converts a frame according to a schema of column ->
+# target dtype: "category", "string" (Arrow-backed when pyarrow is
+# installed) or a NumPy dtype. Integer targets are only used when every
+# value fits exactly; columns with missing values or fractions fall back
+# to float32. Columns not in the schema (extra RDW fields) are handled by
+# rule: text with few distinct values becomes a category, integers are
+# downcast to the smallest type that holds them.
+#
+# Bytes per column are kept in df.attrs["memory"], which survives the
+# Arrow conversion; memory_report() turns them into a table. "before" is
+# the column as plain Python strings or 64-bit numbers, the way
+# read_csv(engine="python") used to hand it to the dashboard.
+
+CATEGORY_RATIO = 0.5  # unscheduled text columns with fewer distinct values per row
+
+
+def _text(values):
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+
+def _string(values):
+    try:
+        return values.astype("string[pyarrow]")
+    except ImportError:
+        return values.astype("string")
+
+
+def _integer(values, dtype):
+    # `values` as integer `dtype` when that is exact, else float32
+    numbers = pd.to_numeric(values, errors="coerce")
+    array = numbers.to_numpy("float64", na_value=np.nan)
+    info = np.iinfo(dtype)
+    if (np.isfinite(array).all() and (array == np.round(array)).all()
+            and (len(array) == 0 or (array.min() >= info.min and array.max() <= info.max))):
+        return numbers.astype(dtype)
+    return numbers.astype("float32")
+
+
+def _convert(values, kind):
+    if kind == "category":
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return values
+        if values.dtype == object:
+            # Model names like 500 come through as ints next to strings
+            values = values.where(values.isna(), values.astype(str))
+        return values.astype("category")
+    if kind == "string":
+        return _string(values)
+    dtype = np.dtype(kind)
+    if dtype.kind in "iu":
+        return _integer(values, dtype)
+    return pd.to_numeric(values, errors="coerce").astype(dtype)
+
+
+def _plain_size(values):
+    if isinstance(values.dtype, pd.CategoricalDtype) or _text(values):
+        values = values.astype(object)
+    elif values.dtype.kind in "iuf" and values.dtype.itemsize < 8:
+        values = values.astype("float64")
+    return int(values.memory_usage(deep=True, index=False))
+
+
+def _rule(values):
+    # Target for a column the schema does not mention, or None to keep it
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return None
+    if _text(values):
+        if values.nunique() < CATEGORY_RATIO * len(values):
+            return "category"
+        return "string"
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return "integer"
+    return None
+
+
+def compact_frame(df, schema):
+    # Convert `df` in place to the compact dtypes of `schema`; returns df
+    previous = df.attrs.get("memory", {})
+    memory = {}
+    for col in df.columns:
+        values = df[col]
+        # a frame read back from a compacted file keeps its original size
+        before = previous.get(col, {}).get("before") or _plain_size(values)
+        kind = schema.get(col) or _rule(values)
+        if kind == "integer":
+            values = pd.to_numeric(values, downcast="integer")
+        elif kind is not None:
+            values = _convert(values, kind)
+        df[col] = values
+        memory[col] = {"before": before, "after": int(values.memory_usage(deep=True, index=False))}
+    df.attrs["memory"] = memory
+    return df
+
+
+def memory_report(df):
+    # Bytes per column before and after compaction, with a total row
+    report = pd.DataFrame.from_dict(df.attrs.get("memory", {}), orient="index",
+                                    columns=["before", "after"])
+    if report.empty:
+        return report
+    report.loc["totaal"] = report.sum()
+    report["factor"] = (report["before"] / report["after"].where(report["after"] > 0)).round(1)
+    return report
@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from data_loader import DATASETS, converted_path, read_source, read_table
+
+# Convert the dashboard source files to typed Arrow IPC files.
+#
+#   python convert_data.py [--base-dir .] [--only sessions vehicles]
+#
+# Each source is parsed once with its schema from data_loader.DATASETS and
+# written uncompressed to converted/<name>.arrow so it can be memory-mapped.
+# Afterwards load time and in-memory size are reported for the original
+# text parse (as app.py used to do it) and for the converted file.
+
+# How app.py parsed each file before the conversion step existed
+ORIGINAL_READ = {
+    "df_muni": lambda path: pd.read_csv(path, delimiter=","),
+    "gdf_points": lambda path: pd.read_csv(path, delimiter=","),
+    "gdf_munis": lambda path: pd.read_csv(path, delimiter=","),
+    "sessions": lambda path: pd.read_csv(path, delimiter=";"),
+    "vehicles": lambda path: pd.read_csv(path, sep=",", engine="python", on_bad_lines="skip"),
+    "vehicles_xlsx": lambda path: pd.read_excel(path),
+}
+
+VIEWS = {
+    "Openchargemap": ["df_muni", "gdf_points", "gdf_munis"],
+    "Laadpaaldata": ["sessions"],
+    "Elektrische autos": ["vehicles"],
+}
+
+
+def convert(name, base_dir="."):
+    df = read_source(name, base_dir)
+    path = converted_path(name, base_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_feather(tmp, compression="uncompressed")
+    os.replace(tmp, path)
+    return path
+
+
+def _measure(load):
+    start = time.perf_counter()
+    df = load()
+    return time.perf_counter() - start, int(df.memory_usage(deep=True).sum())
+
+
+def report(name, base_dir="."):
+    source = os.path.join(base_dir, DATASETS[name]["source"])
+    before = _measure(lambda: ORIGINAL_READ[name](source))
+    after = _measure(lambda: read_table(name, base_dir))
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-dir", default=".")
+    parser.add_argument("--only", nargs="+", choices=sorted(DATASETS))
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or DATASETS:
+        if not os.path.exists(os.path.join(args.base_dir, DATASETS[name]["source"])):
+            print(f"{name}: source {DATASETS[name]['source']} not found, skipped")
+            continue
+        path = convert(name, args.base_dir)
+        results[name] = report(name, args.base_dir)
+        print(f"{name}: wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    print()
+    print(f"{'dataset':<16} {'load before':>12} {'load after':>11} {'mem before':>11} {'mem after':>10}")
+    for name, ((t0, m0), (t1, m1)) in results.items():
+        print(f"{name:<16} {t0 * 1000:>10.0f}ms {t1 * 1000:>9.0f}ms {m0 / 1e6:>9.1f}MB {m1 / 1e6:>8.1f}MB")
+
+    print()
+    for view, names in VIEWS.items():
+        if all(name in results for name in names):
+            t0 = sum(results[n][0][0] for n in names)
+            t1 = sum(results[n][1][0] for n in names)
+            m0 = sum(results[n][0][1] for n in names)
+            m1 = sum(results[n][1][1] for n in names)
+            print(f"{view}: load {t0 * 1000:.0f} -> {t1 * 1000:.0f} ms, "
+                  f"memory {m0 / 1e6:.1f} -> {m1 / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from compact import compact_frame
+from municipality_names import MunicipalityNames
+from profiling import span
+from sessions import SESSION_DTYPES, clean_sessions, month_index
+from shared_store import shared_frame
+from vehicles import VEHICLE_COMPACT, read_vehicle_csv
+
+# Process-wide cache for the dashboard datasets.
+#
+# Streamlit re-executes app.py on every widget interaction, but imported
+# modules stay alive for the lifetime of the server process. Parsed frames
+# are kept here and only rebuilt when one of the source files changes
+# (mtime or size), so a slider tick no longer re-reads CSVs or WKT.
+#
+# Cached frames are shared between all sessions. Callers get a shallow
+# copy: adding or replacing columns stays private to the caller, but the
+# values are the cached ones, so they must never be modified in place
+# (the copies are not immutable, only cheap). The tables themselves live
+# in shared memory (shared_store.py), so other server processes and
+# worker processes on the host attach to the same copy.
+
+CONVERTED_DIR = "converted"
+
+# Source files and how to parse them. `python convert_data.py` writes each
+# one once to an Arrow IPC (Feather v2) file in converted/ with these
+# dtypes applied; read_table() prefers that file and falls back to the
+# source when no up-to-date converted copy exists.
+DATASETS = {
+    "df_muni": {
+        "source": "df_muni.csv",
+        "csv": {"delimiter": ","},
+    },
+    "gdf_points": {
+        "source": "gdf_points.csv",
+        "csv": {"delimiter": ","},
+        "categories": [
+            "OperatorInfo.Title", "AddressInfo.Town", "Conn_ConnectionType.Title",
+            "Conn_Level.Title", "Conn_CurrentType.Description", "Conn_CurrentType.Title",
+            "municipality", "province",
+        ],
+    },
+    "gdf_munis": {
+        "source": "gdf_munis.csv",
+        "csv": {"delimiter": ","},
+        "wkt": ["geometry"],
+    },
+    "sessions": {
+        "source": "fd2.csv",
+        "csv": {"delimiter": ";", "decimal": ",", "dtype": SESSION_DTYPES},
+        "dates": {"Started": "%d-%m-%Y %H:%M", "Ended": "%d-%m-%Y %H:%M"},
+        "categories": ["Urencat", "Urencat2", "Maandjaar", "bucket"],
+        # repair lost decimal separators, blank out-of-range values
+        "clean": clean_sessions,
+    },
+    "vehicles": {
+        "source": "elektrischeautos5.csv",
+        # explicit schema, fast parser, dates and rejected-line report
+        "read": read_vehicle_csv,
+        "categories": ["merk", "handelsbenaming", "klasse_hybride_elektrisch_voertuig"],
+        # categoricals and downcast numbers, see compact.py
+        "compact": VEHICLE_COMPACT,
+    },
+    "vehicles_xlsx": {
+        "source": "elektrischeautos3.xlsx",
+        "excel": {},
+        "categories": [
+            "brandstof_omschrijving", "klasse_hybride_elektrisch_voertuig",
+            "merk", "handelsbenaming", "voertuigsoort",
+        ],
+        "compact": VEHICLE_COMPACT,
+    },
+}
+
+OPENCHARGEMAP_TABLES = ("df_muni", "gdf_points", "gdf_munis")
+
+# Vehicle export as fetched from the data mirror (fetch.py), converted
+# copy first: it needs no parsing and starts the dashboard immediately
+VEHICLE_FILES = [f"{CONVERTED_DIR}/vehicles.arrow", DATASETS["vehicles"]["source"]]
+
+OpenChargeMapData = namedtuple("OpenChargeMapData", ["df_muni", "gdf_points", "gdf_munis"])
+
+_cache = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def dataset_version(paths):
+    # Short stable token for a set of files, used to key derived caches
+    sig = repr(tuple(file_signature(p) for p in paths))
+    return hashlib.sha1(sig.encode()).hexdigest()[:12]
+
+
+def cached(name, paths, build):
+    # Return the cached value for `name`, rebuilding it when any file in
+    # `paths` changed since the last build.
+    sig = tuple(file_signature(p) for p in paths)
+    start = time.perf_counter()
+    with _lock:
+        entry = _cache.get(name)
+    if entry is not None and entry[0] == sig:
+        _stats[name] = {"hit": True, "seconds": time.perf_counter() - start}
+        return entry[1]
+
+    value = build()
+    with _lock:
+        _cache[name] = (sig, value)
+    _stats[name] = {"hit": False, "seconds": time.perf_counter() - start}
+    return value
+
+
+def load_stats(name):
+    # Timing of the most recent load of `name`: {"hit": bool, "seconds": float}
+    return _stats.get(name)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _stats.clear()
+
+
+def converted_path(name, base_dir="."):
+    return os.path.join(base_dir, CONVERTED_DIR, f"{name}.arrow")
+
+
+def apply_schema(df, spec):
+    # Dtypes from a DATASETS entry: parsed dates, categoricals, WKB geometry
+    for col, fmt in spec.get("dates", {}).items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=fmt, errors="coerce")
+    for col in spec.get("categories", []):
+        if col in df.columns:
+            # Model names like 500 come through as ints next to strings
+            values = df[col]
+            if values.dtype == object:
+                values = values.where(values.isna(), values.astype(str))
+            df[col] = values.astype("category")
+    for col in spec.get("wkt", []):
+        if col in df.columns:
+            import shapely
+            with span("load", "wkt"):
+                df[col] = shapely.to_wkb(shapely.from_wkt(df[col].to_numpy()))
+    return df
+
+
+def read_source(name, base_dir="."):
+    spec = DATASETS[name]
+    path = os.path.join(base_dir, spec["source"])
+    with span("load", "read_excel" if "excel" in spec else "read_csv"):
+        if "read" in spec:
+            df = spec["read"](path)
+        elif "excel" in spec:
+            df = pd.read_excel(path, **spec["excel"])
+        else:
+            df = pd.read_csv(path, **spec["csv"])
+    return prepare(df, spec)
+
+
+def prepare(df, spec):
+    # Schema, cleaning and compaction for freshly parsed source rows
+    df = apply_schema(df, spec)
+    if "clean" in spec:
+        df = spec["clean"](df)
+    if "compact" in spec:
+        df = compact_frame(df, spec["compact"])
+    return df
+
+
+def has_converted(name, base_dir="."):
+    converted = converted_path(name, base_dir)
+    source = os.path.join(base_dir, DATASETS[name]["source"])
+    if not os.path.exists(converted):
+        return False
+    return not os.path.exists(source) or os.path.getmtime(converted) >= os.path.getmtime(source)
+
+
+def table_paths(name, base_dir="."):
+    # Files whose change invalidates the cached table
+    if has_converted(name, base_dir):
+        return [converted_path(name, base_dir)]
+    return [os.path.join(base_dir, DATASETS[name]["source"])]
+
+
+def table_available(name, base_dir="."):
+    # The converted file or the source is present
+    return all(os.path.exists(p) for p in table_paths(name, base_dir))
+
+
+def read_table(name, base_dir="."):
+    # Typed frame for a dataset: memory-mapped Arrow file when converted,
+    # else the (slow) source file parsed with the same schema. With one
+    # block per column, numeric and datetime columns without nulls stay
+    # read-only views into the mapped file; columns with nulls, strings and
+    # categoricals are converted into process memory. convert_data.py
+    # replaces files with os.replace(), so a mapping stays valid.
+    if has_converted(name, base_dir):
+        from pyarrow import feather
+
+        with span("load", "read_arrow"):
+            table = feather.read_table(converted_path(name, base_dir), memory_map=True)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table  # unusable after self_destruct
+        if "compact" in DATASETS[name]:
+            # files converted before compaction existed; a no-op otherwise
+            df = compact_frame(df, DATASETS[name]["compact"])
+        return df
+    return read_source(name, base_dir)
+
+
+def read_vehicles(name, base_dir="."):
+    # read_table() for the RDW export ("vehicles") or the bundled xlsx
+    # subset ("vehicles_xlsx"). The subset has no jaar column: it is the
+    # year of datum_eerste_toelating, as in the export. It has no
+    # massa_rijklaar either.
+    df = read_table(name, base_dir)
+    if "jaar" not in df.columns:
+        df["jaar"] = df["datum_eerste_toelating"].dt.year.astype("float32")
+    return df
+
+
+def shared_table(name, base_dir="."):
+    # read_table() result from shared memory, parsed once per host
+    return shared_frame(name, table_version(name, base_dir), lambda: read_table(name, base_dir))
+
+
+def _shallow(frame):
+    return frame.copy(deep=False)
+
+
+def _build_openchargemap(base_dir):
+    import geopandas as gpd
+
+    df_muni = shared_table("df_muni", base_dir)
+    gdf_points = shared_table("gdf_points", base_dir)
+    # geometries are per-process objects; the municipality table is small
+    gdf_munis = read_table("gdf_munis", base_dir)
+
+    # Geometry is stored as WKB; decoding it is vectorised and much cheaper
+    # than apply(wkt.loads) per row
+    with span("load", "from_wkb"):
+        geometry = gpd.GeoSeries.from_wkb(gdf_munis.pop("geometry"), crs="EPSG:4326")
+    gdf_munis = gpd.GeoDataFrame(gdf_munis, geometry=geometry, crs="EPSG:4326")
+
+    # df_muni (the offline per-municipality table; the map uses the spatial
+    # join) is keyed on names ("province"); the names that do not resolve
+    # to one municipality are reported in the view
+    unmatched = MunicipalityNames(gdf_munis).resolve(df_muni["province"])[1]
+    df_muni = df_muni.copy(deep=False)
+    df_muni.attrs["unmatched"] = unmatched.to_dict(orient="records")
+
+    return OpenChargeMapData(df_muni, gdf_points, gdf_munis)
+
+
+def _openchargemap_paths(base_dir):
+    return [p for name in OPENCHARGEMAP_TABLES for p in table_paths(name, base_dir)]
+
+
+def load_openchargemap(base_dir="."):
+    data = cached("openchargemap", _openchargemap_paths(base_dir), lambda: _build_openchargemap(base_dir))
+    return OpenChargeMapData(*(_shallow(frame) for frame in data))
+
+
+def openchargemap_version(base_dir="."):
+    return dataset_version(_openchargemap_paths(base_dir))
+
+
+def table_version(name, base_dir="."):
+    return dataset_version(table_paths(name, base_dir))
+
+
+def complete_sessions(fd3):
+    # Drop NaT values to avoid errors in min/max calculation
+    fd3 = fd3.dropna(subset=["Started", "Ended"]).reset_index(drop=True)
+    # Integer month of the start, the heatmap's column axis
+    fd3["maand"] = month_index(fd3["Started"])
+    return fd3
+
+
+def _build_sessions(base_dir):
+    return complete_sessions(read_table("sessions", base_dir))
+
+
+def _shared_sessions(base_dir):
+    return shared_frame("sessions", table_version("sessions", base_dir), lambda: _build_sessions(base_dir))
+
+
+def load_sessions(base_dir="."):
+    data = cached("sessions", table_paths("sessions", base_dir), lambda: _shared_sessions(base_dir))
+    return _shallow(data)
+
+
+if __name__ == "__main__":
+    # python data_loader.py [data dir] -> cold vs warm load time
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    for run in ("cold", "warm"):
+        load_openchargemap(base_dir)
+        stats = load_stats("openchargemap")
+        print(f"{run}: {stats['seconds'] * 1000:.1f} ms (cache hit: {stats['hit']})")
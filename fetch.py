@@ -0,0 +1,356 @@
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import urllib.error
+import urllib.request
+
+# Data acquisition for files the repository does not ship.
+#
+# The RDW export used to be pulled from Google Drive with gdown whenever
+# it was missing: seconds to minutes on the first request, impossible
+# air-gapped and never verified. A mirror is now a directory or HTTP base
+# URL holding the files plus a manifest.json:
+#
+#   {"version": "2024-11", "files": {
+#       "elektrischeautos5.csv": {"sha256": "...", "size": 123},
+#       "converted/vehicles.arrow": {"sha256": "...", "size": 456}}}
+#
+# fetch() downloads a file in CHUNK_SIZE pieces to a .part file (resuming
+# a partial one with an HTTP Range request), checks size and sha256 and
+# renames it atomically into cache_dir/<version>/<path>. A .sha256 marker
+# next to the file records the verification, so later starts only stat
+# it. When the mirror cannot be reached the newest complete version in the
+# cache is used. A manifest whose version or file path is absolute or
+# contains ".." is rejected like an unreachable mirror, since both are
+# joined onto cache_dir; so is one without a "files" table or with an
+# entry lacking sha256 or size (check_manifest()).
+#
+# The mirror is DASHBOARD_DATA_SOURCE (a path or http(s) URL), else the
+# local "mirror" directory; `python fetch.py build <dir> <files...>`
+# creates one. `python fetch.py selftest` runs a download against a local
+# HTTP stand-in, including an interrupted transfer.
+
+CACHE_DIR = "data_cache"
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 1024 ** 2
+SOURCE_ENV = "DASHBOARD_DATA_SOURCE"
+DEFAULT_MIRROR = "mirror"
+
+
+class ChecksumError(ValueError):
+    pass
+
+
+class IncompleteDownload(OSError):
+    # The transfer stopped early; the .part file is kept for resuming
+    pass
+
+
+class DirectorySource:
+    # Mirror on a local or mounted file system
+
+    def __init__(self, root):
+        self.root = root
+
+    def __repr__(self):
+        return f"DirectorySource({self.root!r})"
+
+    def manifest(self):
+        with open(os.path.join(self.root, MANIFEST)) as f:
+            return json.load(f)
+
+    def open(self, path, offset=0):
+        # (binary stream positioned at `offset`, whether it honoured the offset)
+        stream = open(os.path.join(self.root, path), "rb")
+        stream.seek(offset)
+        return stream, True
+
+
+class HttpSource:
+    # Mirror on a file server; partial downloads resume with Range requests
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"HttpSource({self.base_url!r})"
+
+    def manifest(self):
+        with urllib.request.urlopen(f"{self.base_url}/{MANIFEST}", timeout=self.timeout) as response:
+            return json.load(response)
+
+    def open(self, path, offset=0):
+        request = urllib.request.Request(f"{self.base_url}/{path}")
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+        response = urllib.request.urlopen(request, timeout=self.timeout)
+        # 200 instead of 206: the server sent the whole file
+        return response, response.status == 206 or not offset
+
+
+def source_from_env(base_dir="."):
+    location = os.environ.get(SOURCE_ENV) or os.path.join(base_dir, DEFAULT_MIRROR)
+    if location.startswith(("http://", "https://")):
+        return HttpSource(location)
+    return DirectorySource(location)
+
+
+def safe_relpath(path):
+    # `path` from a manifest, checked before it is joined onto cache_dir
+    if not isinstance(path, str) or not path or os.path.isabs(path) \
+            or ".." in path.replace("\\", "/").split("/"):
+        raise ValueError(f"unsafe path in manifest: {path!r}")
+    return path
+
+
+def check_manifest(manifest):
+    # ValueError unless `manifest` has a safe version and a sha256 and
+    # size for every file; returns it unchanged
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("files"), dict):
+        raise ValueError("manifest has no files table")
+    safe_relpath(manifest.get("version"))
+    for path, entry in manifest["files"].items():
+        if not isinstance(entry, dict) or not isinstance(entry.get("sha256"), str) \
+                or not isinstance(entry.get("size"), int) or entry["size"] < 0:
+            raise ValueError(f"manifest entry for {path!r} needs sha256 and size")
+    return manifest
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _marker(path):
+    return path + ".sha256"
+
+
+def is_verified(path, entry):
+    # The file was checked against `entry` before and has not changed size
+    try:
+        with open(_marker(path)) as f:
+            recorded = f.read().strip()
+        return recorded == entry["sha256"] and os.path.getsize(path) == entry["size"]
+    except OSError:
+        return False
+
+
+def download(source, path, entry, target, progress=None):
+    # Fetch `path` from `source` into `target` via target.part, resuming a
+    # previous partial download; verifies and renames atomically
+    part = target + ".part"
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    done = os.path.getsize(part) if os.path.exists(part) else 0
+    if done > entry["size"]:
+        done = 0
+
+    if done < entry["size"]:
+        stream, resumed = source.open(path, done)
+        with stream, open(part, "ab" if resumed else "wb") as out:
+            done = done if resumed else 0
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                out.write(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, entry["size"])
+
+    size = os.path.getsize(part)
+    if size < entry["size"]:
+        raise IncompleteDownload(f"{path}: {size} of {entry['size']} bytes, fetch again to resume")
+    checksum = file_sha256(part)
+    if size != entry["size"] or checksum != entry["sha256"]:
+        os.remove(part)
+        raise ChecksumError(f"{path}: got {size} bytes sha256 {checksum}, "
+                            f"expected {entry['size']} bytes sha256 {entry['sha256']}")
+    os.replace(part, target)
+    with open(_marker(target), "w") as f:
+        f.write(checksum)
+    return target
+
+
+def cached_versions(cache_dir=CACHE_DIR):
+    # Versions with a stored manifest, newest (by manifest mtime) first
+    if not os.path.isdir(cache_dir):
+        return []
+    versions = [v for v in os.listdir(cache_dir) if os.path.exists(os.path.join(cache_dir, v, MANIFEST))]
+    return sorted(versions, key=lambda v: os.path.getmtime(os.path.join(cache_dir, v, MANIFEST)), reverse=True)
+
+
+def _cached_manifest(cache_dir, version):
+    with open(os.path.join(cache_dir, version, MANIFEST)) as f:
+        return check_manifest(json.load(f))
+
+
+def fetch(paths, source=None, cache_dir=CACHE_DIR, progress=None):
+    # Directory holding verified copies of the first of `paths` the mirror
+    # lists (e.g. a converted file before its source), as
+    # (version directory, path); offline, the newest cached version that has one
+    source = source or source_from_env()
+    error = None
+    try:
+        manifest = check_manifest(source.manifest())
+    except (OSError, ValueError, urllib.error.URLError) as exc:
+        manifest, error = None, exc
+
+    for path in paths if manifest is not None else []:
+        entry = manifest["files"].get(path)
+        if entry is None:
+            continue
+        version_dir = os.path.join(cache_dir, manifest["version"])
+        target = os.path.join(version_dir, safe_relpath(path))
+        try:
+            if not is_verified(target, entry):
+                download(source, path, entry, target,
+                         progress and (lambda done, total: progress(path, done, total)))
+        except (OSError, ChecksumError, http.client.HTTPException) as exc:
+            error = exc  # fall back to the cache below
+            break
+        tmp = os.path.join(version_dir, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(version_dir, MANIFEST))
+        return version_dir, path
+
+    for version in cached_versions(cache_dir):
+        try:
+            files = _cached_manifest(cache_dir, version)["files"]
+        except (OSError, ValueError):
+            continue  # unreadable or damaged, try an older version
+        for path in paths:
+            target = os.path.join(cache_dir, version, path)
+            if path in files and is_verified(target, files[path]):
+                return os.path.join(cache_dir, version), path
+    if error is not None:
+        raise error
+    raise FileNotFoundError(f"none of {paths} available from {source!r} or in {cache_dir}")
+
+
+def build_mirror(mirror_dir, files, version, base_dir="."):
+    # Copy `files` (paths relative to base_dir) into a mirror with manifest
+    safe_relpath(version)
+    entries = {}
+    for path in files:
+        target = os.path.join(mirror_dir, safe_relpath(path))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(os.path.join(base_dir, path), target)
+        entries[path] = {"sha256": file_sha256(target), "size": os.path.getsize(target)}
+    with open(os.path.join(mirror_dir, MANIFEST), "w") as f:
+        json.dump({"version": version, "files": entries}, f, indent=1)
+    return entries
+
+
+def _selftest():
+    # Local HTTP stand-in with Range support that drops the first transfer
+    # halfway: the fetch must fail, resume from the .part file, verify, run
+    # offline from the cache and reject a tampered mirror
+    import tempfile
+    import threading
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class FlakyRangeHandler(SimpleHTTPRequestHandler):
+        ranges = []
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            path = self.translate_path(self.path)
+            if self.path.endswith(MANIFEST) or not os.path.isfile(path):
+                return super().do_GET()
+            with open(path, "rb") as f:
+                data = f.read()
+            start = int(self.headers["Range"][6:].rstrip("-")) if self.headers["Range"] else 0
+            self.ranges.append(start)
+            self.send_response(206 if start else 200)
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+            # the first transfer breaks off halfway
+            stop = len(data) // 2 if len(self.ranges) == 1 else len(data)
+            self.wfile.write(data[start:stop])
+            self.close_connection = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror, cache = os.path.join(tmp, "mirror"), os.path.join(tmp, "cache")
+        entry = build_mirror(mirror, ["fd2.csv"], "selftest")["fd2.csv"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(FlakyRangeHandler, directory=mirror))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        source = HttpSource(f"http://127.0.0.1:{server.server_port}")
+
+        try:
+            fetch(["fd2.csv"], source, cache)
+            raise AssertionError("broken transfer was accepted")
+        except (OSError, http.client.HTTPException):
+            pass
+        version_dir, path = fetch(["fd2.csv"], source, cache)
+        assert FlakyRangeHandler.ranges[1] > 0, "second transfer did not resume"
+        assert file_sha256(os.path.join(version_dir, path)) == entry["sha256"]
+        print(f"resumed at byte {FlakyRangeHandler.ranges[1]} of {entry['size']}, checksum verified")
+
+        server.shutdown()
+        server.server_close()
+        assert fetch(["fd2.csv"], source, cache) == (version_dir, path)
+        print("mirror offline: cached version used")
+
+        with open(os.path.join(mirror, "fd2.csv"), "ab") as f:
+            f.write(b"tampered")
+        try:
+            fetch(["fd2.csv"], DirectorySource(mirror), os.path.join(tmp, "fresh"))
+            raise AssertionError("tampered file was accepted")
+        except ChecksumError:
+            print("tampered mirror rejected")
+
+        build_mirror(os.path.join(tmp, "escape"), ["fd2.csv"], "selftest")
+        with open(os.path.join(tmp, "escape", MANIFEST), "r+") as f:
+            manifest = json.load(f)
+            manifest["version"] = "../outside"
+            f.seek(0)
+            f.truncate()
+            json.dump(manifest, f)
+        try:
+            fetch(["fd2.csv"], DirectorySource(os.path.join(tmp, "escape")), os.path.join(tmp, "fresh"))
+            raise AssertionError("manifest version outside the cache was accepted")
+        except ValueError:
+            assert not os.path.exists(os.path.join(tmp, "outside"))
+            print("manifest version with '..' rejected")
+
+        broken = [{"version": "selftest"},
+                  {"version": "selftest", "files": ["fd2.csv"]},
+                  {"version": "selftest", "files": {"fd2.csv": {"size": entry["size"]}}},
+                  {"version": "selftest", "files": {"fd2.csv": {"sha256": entry["sha256"], "size": "1"}}}]
+        for manifest in broken:
+            with open(os.path.join(tmp, "escape", MANIFEST), "w") as f:
+                json.dump(manifest, f)
+            malformed = DirectorySource(os.path.join(tmp, "escape"))
+            try:
+                fetch(["fd2.csv"], malformed, os.path.join(tmp, "empty"))
+                raise AssertionError(f"malformed manifest was accepted: {manifest}")
+            except ValueError:
+                pass
+            assert fetch(["fd2.csv"], malformed, cache) == (version_dir, path)
+        print(f"{len(broken)} malformed manifests rejected, cached version used")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="create a mirror directory with manifest")
+    build.add_argument("mirror_dir")
+    build.add_argument("files", nargs="+")
+    build.add_argument("--version", required=True)
+    commands.add_parser("selftest", help="download through a local HTTP stand-in")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for path, entry in build_mirror(args.mirror_dir, args.files, args.version).items():
+            print(f"{path}: {entry['size']} bytes, sha256 {entry['sha256']}")
+    else:
+        _selftest()
@@ -0,0 +1,118 @@
+import io
+import threading
+from collections import OrderedDict
+
+from profiling import span
+
+# Rendered-figure cache for the matplotlib/seaborn charts.
+#
+# Each chart is keyed on its dataset version plus the widget values it
+# depends on. On a miss the draw function builds the figure, which is
+# rendered to PNG bytes and closed right away (figures used to stay open
+# across reruns), also when the draw function fails. On a hit the bytes are returned without touching
+# matplotlib. Entries are evicted least-recently-used once the cache holds
+# more than MAX_BYTES.
+
+MAX_BYTES = 64 * 1024 ** 2
+FORMAT = "png"
+
+
+class FigureCache:
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # pyplot keeps global state, so only one session draws at a time
+        self._render_lock = threading.Lock()
+
+    def get(self, key, draw):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        with self._render_lock, span("render", key[0]):
+            try:
+                image = render(draw())
+            except BaseException:
+                # draw() may have opened figures before it failed; close
+                # them all, no other session draws while the lock is held
+                import matplotlib.pyplot as plt
+
+                plt.close("all")
+                raise
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = image
+                self.size += len(image)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def render(fig, fmt=FORMAT):
+    # Figure -> image bytes, always closing the figure
+    import matplotlib.pyplot as plt
+
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+figures = FigureCache()
+
+
+def cached_figure(key, draw):
+    # PNG bytes for `key`; `draw()` must return a matplotlib Figure and is
+    # only called on a cache miss
+    return figures.get(key, draw)
+
+
+if __name__ == "__main__":
+    # python figure_cache.py -> cold vs cached render time of a sample chart
+    import time
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    def draw():
+        fig, ax = plt.subplots(figsize=(12, 6), dpi=150)
+        ax.scatter(*np.random.default_rng(0).normal(size=(2, 10_000)))
+        return fig
+
+    for run in ("render", "cached"):
+        start = time.perf_counter()
+        cached_figure(("sample",), draw)
+        print(f"{run}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def failing_draw():
+        plt.subplots()
+        raise RuntimeError("draw failed")
+
+    for attempt in range(3):
+        try:
+            cached_figure(("failing", attempt), failing_draw)
+        except RuntimeError:
+            pass
+    print(f"open figures after 3 failed draws: {len(plt.get_fignums())}")
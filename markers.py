@@ -0,0 +1,79 @@
+import html
+import json
+
+import numpy as np
+import pandas as pd
+
+from profiling import timed
+
+# Columnar marker payloads for the Openchargemap view.
+#
+# Tooltip and popup HTML is assembled with vectorised string operations on
+# whole columns, and all markers are emitted as a single GeoJSON
+# FeatureCollection string. Text values are escaped once per distinct value
+# (towns, postcodes and connector names repeat a lot), not once per row.
+
+TOOLTIP_FIELDS = ["AddressInfo.Postcode", "AddressInfo.Town"]
+POPUP_FIELDS = ["Conn_PowerKW", "Conn_ConnectionType.Title", "Conn_CurrentType.Title"]
+
+
+def _escaped(values):
+    # HTML-escape a column, working on its distinct values only
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    escaped = np.array([html.escape(str(v)) for v in uniques], dtype=object)
+    return pd.Series(escaped[codes], index=values.index)
+
+
+def _json_strings(values):
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    encoded = np.array([json.dumps(v) for v in uniques], dtype=object)
+    return pd.Series(encoded[codes], index=values.index)
+
+
+def marker_tooltips(points):
+    return (
+        "Postcode: " + _escaped(points["AddressInfo.Postcode"]) + "<br>"
+        + "Town: " + _escaped(points["AddressInfo.Town"]) + "<br>"
+        + "Click for more"
+    )
+
+
+def marker_popups(points):
+    return (
+        "<i>Power KW:</i> <br> <b>" + _escaped(points["Conn_PowerKW"]) + "</b> <br>"
+        + "<i>Connection type:</i> <br> <b>" + _escaped(points["Conn_ConnectionType.Title"]) + "</b> <br>"
+        + "<i>Current type:</i> <br> <b>" + _escaped(points["Conn_CurrentType.Title"]) + "</b> <br>"
+    )
+
+
+def marker_feature_collection(points, lat="AddressInfo.Latitude", lon="AddressInfo.Longitude"):
+    # Serialise `points` as a GeoJSON FeatureCollection string with
+    # `tooltip` and `popup` properties
+    points = points[points[lat].notna() & points[lon].notna()]
+    if len(points) == 0:
+        return '{"type": "FeatureCollection", "features": []}'
+
+    features = (
+        '{"type": "Feature", "geometry": {"type": "Point", "coordinates": ['
+        + points[lon].astype(str) + ", " + points[lat].astype(str)
+        + ']}, "properties": {"tooltip": ' + _json_strings(marker_tooltips(points))
+        + ', "popup": ' + _json_strings(marker_popups(points)) + "}}"
+    )
+    return '{"type": "FeatureCollection", "features": [' + ", ".join(features) + "]}"
+
+
+@timed("render")
+def marker_layer(points, name="Laadpalen"):
+    # One folium layer for all points instead of a CircleMarker per row
+    import folium
+
+    if len(points) == 0:
+        # folium rejects tooltip fields on an empty collection
+        return folium.FeatureGroup(name=name)
+    return folium.GeoJson(
+        marker_feature_collection(points),
+        name=name,
+        marker=folium.CircleMarker(radius=4, fill=True, fill_opacity=0.8),
+        tooltip=folium.GeoJsonTooltip(fields=["tooltip"], labels=False),
+        popup=folium.GeoJsonPopup(fields=["popup"], labels=False),
+    )
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Municipality names from different sources resolved to one code.
+#
+# Tables keyed on municipality names (the "province" column of
+# df_muni.csv) do not match GADM's NAME_2 as plain strings: names are
+# spelled differently ("Aa en Hunze" vs "AaenHunze") and the two Bergens
+# (Limburg and Noord-Holland) share one name. MunicipalityNames is built
+# once from gdf_munis and resolves names to GID_2, the code the GeoJSON
+# levels and the spatial join use:
+#
+#   normalize   case, accents, spaces and punctuation are dropped, so
+#               "Aa en Hunze" and "AaenHunze" are both "aaenhunze"
+#   aliases     GADM's VARNAME_2 (Frisian and former names) and ALIASES;
+#               an official NAME_2 always wins over an alias
+#   province    a name several municipalities share is settled with the
+#               province (NAME_1) when the caller has one
+#
+# resolve() returns the code per name and a report of the names that were
+# not found (unknown) or could not be settled (ambiguous).
+
+# Common names that differ from GADM's NAME_2 by more than spelling
+ALIASES = {
+    "Den Haag": "'s-Gravenhage",
+    "Den Bosch": "'s-Hertogenbosch",
+    "Nuenen, Gerwen en Nederwetten": "Nuenenc.a.",
+}
+
+
+def normalize(name):
+    # "'s-Gravenhage" -> "sgravenhage", "Súdwest-Fryslân" -> "sudwestfryslan"
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", text.casefold())
+
+
+class MunicipalityNames:
+
+    def __init__(self, munis):
+        self.munis = munis[["GID_2", "NAME_1", "NAME_2"]].reset_index(drop=True)
+        self.provinces = [normalize(p) for p in self.munis["NAME_1"]]
+        self.rows = {}  # normalized name -> rows of self.munis
+        for row, name in enumerate(self.munis["NAME_2"]):
+            self.rows.setdefault(normalize(name), []).append(row)
+
+        official = set(self.rows)
+        aliases = {}
+        if "VARNAME_2" in munis.columns:
+            for row, variants in enumerate(munis["VARNAME_2"]):
+                for variant in str(variants).split("|") if pd.notna(variants) else []:
+                    aliases.setdefault(normalize(variant), []).append(row)
+        for alias, name in ALIASES.items():
+            aliases.setdefault(normalize(alias), []).extend(self.rows.get(normalize(name), []))
+        for key, rows in aliases.items():
+            if key not in official and rows:
+                self.rows[key] = sorted(set(rows))
+
+    def candidates(self, name, province=None):
+        # Rows `name` can refer to, narrowed to `province` when given
+        rows = self.rows.get(normalize(name), [])
+        if province is not None and pd.notna(province) and len(rows) > 1:
+            rows = [row for row in rows if self.provinces[row] == normalize(province)]
+        return rows
+
+    def resolve(self, names, provinces=None):
+        # (GID_2 per name, NaN where unresolved; report with one row per
+        # distinct unresolved name). Each distinct name is looked up once.
+        names = pd.Series(names).reset_index(drop=True)
+        provinces = (pd.Series(provinces).reset_index(drop=True) if provinces is not None
+                     else pd.Series(np.nan, index=names.index))
+        keys = pd.MultiIndex.from_arrays([names.astype(object), provinces.astype(object)])
+        codes, uniques = pd.factorize(keys)
+
+        resolved, report = [], []
+        for name, province in uniques:
+            rows = self.candidates(name, province)
+            resolved.append(self.munis["GID_2"][rows[0]] if len(rows) == 1 else np.nan)
+            if len(rows) != 1:
+                report.append({"name": name, "province": province,
+                               "status": "ambiguous" if rows else "unknown",
+                               "candidates": ", ".join(self.munis["GID_2"][rows])})
+        codes = pd.Series(np.asarray(resolved, dtype=object)[codes], index=names.index)
+        return codes, pd.DataFrame(report, columns=["name", "province", "status", "candidates"])
+
+
+if __name__ == "__main__":
+    # python municipality_names.py [data dir] -> df_muni.csv resolved
+    # against gdf_munis.csv, plus a few spellings from other sources
+    import os
+    import sys
+
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    munis = pd.read_csv(os.path.join(base_dir, "gdf_munis.csv"), usecols=lambda c: c != "geometry")
+    index = MunicipalityNames(munis)
+
+    df_muni = pd.read_csv(os.path.join(base_dir, "df_muni.csv"))
+    codes, report = index.resolve(df_muni["province"])
+    print(f"df_muni.csv: {codes.notna().sum()} of {len(codes)} names resolved")
+    print(report.to_string(index=False) if len(report) else "all names resolved")
+
+    samples = ["Aa en Hunze", "Den Haag", "'s-Hertogenbosch", "Súdwest-Fryslân", "Ljouwert",
+               "Nuenen, Gerwen en Nederwetten", "Bergen", "Bergen", "Atlantis"]
+    codes, report = index.resolve(samples, [None] * 7 + ["Limburg", None])
+    for name, code in zip(samples, codes):
+        print(f"  {name!r:34} -> {code}")
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Model popularity per brand for the Elektrische autos view.
+#
+# The view keeps the models of the selected brand with more than a given
+# number of vehicles. groupby('handelsbenaming').filter(lambda) did that
+# with one Python call per model on every brand selection. Here every row
+# gets a (merk, handelsbenaming) group id once, from the categorical
+# codes. Groups are numbered brand by brand, so a brand's models are a
+# contiguous range of ids and its rows a contiguous slice of the rows
+# sorted by group. Counts for any subset of rows (a slider filter) are a
+# single np.bincount, and the rows of the popular models follow from a
+# boolean mask over the groups, so no threshold or brand size costs a
+# Python call per model.
+
+
+class ModelPopularity:
+
+    def __init__(self, df, weight=None):
+        self.size = len(df)
+        self.brands = df["merk"].cat.categories
+        self.models = df["handelsbenaming"].cat.categories
+        merk = df["merk"].cat.codes.to_numpy().astype("int64")
+        model = df["handelsbenaming"].cat.codes.to_numpy().astype("int64")
+        self.weights = None if weight is None else df[weight].to_numpy("float64")
+
+        valid = (merk >= 0) & (model >= 0)
+        keys, group = np.unique(merk[valid] * len(self.models) + model[valid], return_inverse=True)
+        self.group = np.full(self.size, -1, dtype="int64")
+        self.group[valid] = group
+        self.group_merk = keys // len(self.models)
+        self.group_model = keys % len(self.models)
+
+        # Rows sorted by group; group g owns order[start[g]:start[g + 1]]
+        self.order = np.argsort(self.group, kind="stable")[np.count_nonzero(~valid):]
+        self.start = np.searchsorted(self.group[self.order], np.arange(len(keys) + 1))
+        # Brand b owns groups brand_start[b]:brand_start[b + 1]
+        self.brand_start = np.searchsorted(self.group_merk, np.arange(len(self.brands) + 1))
+        self.totals = self.counts()
+
+    def counts(self, positions=None):
+        # Vehicles per group over all rows or the row `positions`
+        group = self.group if positions is None else self.group[positions]
+        weights = self.weights if positions is None or self.weights is None else self.weights[positions]
+        valid = group >= 0
+        return np.bincount(group[valid], None if weights is None else weights[valid],
+                           minlength=len(self.group_merk))
+
+    def table(self, positions=None):
+        # (merk, handelsbenaming) -> vehicles, for the groups present
+        counts = self.counts(positions)
+        present = counts > 0
+        index = pd.MultiIndex.from_arrays([
+            self.brands[self.group_merk[present]],
+            self.models[self.group_model[present]],
+        ], names=["merk", "handelsbenaming"])
+        return pd.Series(counts[present], index=index, name="aantal")
+
+    def _popular_groups(self, threshold, positions):
+        counts = self.totals if positions is None else self.counts(positions)
+        # trailing False for rows without a group (id -1)
+        return np.append(counts > threshold, False)
+
+    def popular_rows(self, merk, threshold, positions=None):
+        # Sorted row positions (within `positions` when given) of the models
+        # of `merk` with more than `threshold` vehicles
+        b = self.brands.get_loc(merk)
+        g0, g1 = self.brand_start[b], self.brand_start[b + 1]
+        popular = self._popular_groups(threshold, positions)
+        if positions is None:
+            sizes = np.diff(self.start[g0:g1 + 1])
+            rows = self.order[self.start[g0]:self.start[g1]]
+            return np.sort(rows[np.repeat(popular[g0:g1], sizes)])
+        positions = np.asarray(positions)
+        group = self.group[positions]
+        return positions[popular[group] & (group >= g0) & (group < g1)]
+
+    def brand_rows(self, threshold, positions=None):
+        # {merk: sorted row positions of its popular models} for every brand
+        # that has one, in a single pass over the rows
+        popular = self._popular_groups(threshold, positions)
+        rows = self.order if positions is None else np.asarray(positions)
+        rows = rows[popular[self.group[rows]]]
+        rows = rows[np.argsort(self.group[rows], kind="stable")]
+        merk = self.group_merk[self.group[rows]]
+        cuts = np.searchsorted(merk, np.arange(len(self.brands) + 1))
+        return {self.brands[b]: np.sort(rows[cuts[b]:cuts[b + 1]])
+                for b in np.unique(merk)}
+
+
+if __name__ == "__main__":
+    # python popularity.py -> groupby().filter(lambda) vs the index, every brand
+    import time
+
+    from data_loader import read_table
+
+    frame = read_table("vehicles_xlsx")
+    popularity = ModelPopularity(frame)
+
+    start = time.perf_counter()
+    for merk in popularity.brands:
+        subset = frame[frame["merk"] == merk]
+        subset.groupby("handelsbenaming", observed=True).filter(lambda x: len(x) > 50)
+    print(f"groupby().filter: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    for merk in popularity.brands:
+        frame.take(popularity.popular_rows(merk, 50))
+    print(f"ModelPopularity: {(time.perf_counter() - start) * 1000:.1f} ms")
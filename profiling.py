@@ -0,0 +1,313 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+# Per-rerun stage timings for the dashboard.
+#
+# A slow rerun used to be a guess: reading CSVs, decoding geometry, the
+# range filters, the aggregations, drawing the charts or serialising the
+# map. Code marks its stages with spans:
+#
+#   with span("filter", "sessions_index"):     # context manager
+#       ...
+#   @timed("render")                           # decorator
+#   def marker_layer(...):
+#
+# Stages are load, filter, aggregate, render and serialize (the same
+# split as benchmarks/bench_app.py); the name says which step it was.
+# Times are exclusive: a span nested in another is not counted twice.
+# app.py opens a record per script run with start_rerun(view) and closes it
+# with finish_rerun(); a run cut short by st.rerun() is closed, marked
+# interrupted, when the next one starts in the same thread. Spans outside a
+# rerun (fragments, worker processes) are not recorded.
+#
+# Switched on with DASHBOARD_PROFILE=1, or =memory to also trace
+# allocations (tracemalloc): each span then reports its peak above the
+# memory in use when it started, and each rerun the source lines that
+# retained the most memory over the run. Finished reruns go to
+#
+#   history                     last HISTORY reruns of this process, shown
+#                               in the sidebar with ?debug=1 in the URL
+#   DASHBOARD_PROFILE_LOG       JSONL file, one line per rerun
+#   DASHBOARD_PROFILE_PORT      Prometheus text format on :port/metrics,
+#                               on 127.0.0.1 unless DASHBOARD_PROFILE_HOST
+#                               names another interface (0.0.0.0 for all)
+#
+# Switched off, span() returns a shared no-op context manager and timed()
+# returns the function itself, so the instrumented code runs as before.
+
+PROFILE_ENV = "DASHBOARD_PROFILE"
+LOG_ENV = "DASHBOARD_PROFILE_LOG"
+PORT_ENV = "DASHBOARD_PROFILE_PORT"
+HOST_ENV = "DASHBOARD_PROFILE_HOST"
+STAGES = ("load", "filter", "aggregate", "render", "serialize")
+HISTORY = 20
+TOP_ALLOCATIONS = 10
+
+MODE = os.environ.get(PROFILE_ENV, "0")
+ENABLED = MODE not in ("", "0")
+MEMORY = MODE == "memory"
+
+history = deque(maxlen=HISTORY)
+_totals = {}  # (metric, labels) -> [sum, count] or peak
+_local = threading.local()
+_lock = threading.Lock()
+_server = None
+_NULL = contextlib.nullcontext()
+
+
+class Rerun:
+
+    def __init__(self, view):
+        self.view = view
+        self.time = datetime.now().isoformat(timespec="seconds")
+        self.start = time.perf_counter()
+        self.spans = {}   # (stage, name) -> [seconds, calls, peak bytes]
+        self.stack = []   # open spans: [start, child seconds, peak, base]
+        self.snapshot = _snapshot() if MEMORY else None
+
+    def record(self, status):
+        stages = dict.fromkeys(STAGES, 0.0)
+        spans = []
+        for (stage, name), (seconds, calls, peak) in self.spans.items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+            spans.append({"stage": stage, "name": name, "seconds": seconds, "calls": calls,
+                          "peak": peak if MEMORY else None})
+        record = {"time": self.time, "view": self.view, "status": status,
+                  "seconds": time.perf_counter() - self.start, "stages": stages, "spans": spans}
+        if self.snapshot is not None:
+            growth = _snapshot().compare_to(self.snapshot, "lineno")
+            record["allocations"] = [
+                {"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "bytes": stat.size_diff}
+                for stat in growth[:TOP_ALLOCATIONS] if stat.size_diff > 0]
+        return record
+
+
+def _snapshot():
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+class _Span:
+
+    __slots__ = ("rerun", "key")
+
+    def __init__(self, rerun, key):
+        self.rerun = rerun
+        self.key = key
+
+    def __enter__(self):
+        stack = self.rerun.stack
+        base = 0
+        if MEMORY:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][2] = max(stack[-1][2], peak)
+            tracemalloc.reset_peak()
+            base = current
+        stack.append([time.perf_counter(), 0.0, 0, base])
+
+    def __exit__(self, *exc):
+        start, child, peak, base = self.rerun.stack.pop()
+        elapsed = time.perf_counter() - start
+        if MEMORY:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        if self.rerun.stack:
+            parent = self.rerun.stack[-1]
+            parent[1] += elapsed
+            parent[2] = max(parent[2], peak)
+        entry = self.rerun.spans.setdefault(self.key, [0.0, 0, 0])
+        entry[0] += elapsed - child
+        entry[1] += 1
+        entry[2] = max(entry[2], peak - base)
+        return False
+
+
+def span(stage, name=None):
+    # Context manager timing one step of `stage` in the current rerun
+    if not ENABLED:
+        return _NULL
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return _NULL
+    return _Span(rerun, (stage, name or stage))
+
+
+def timed(stage, name=None):
+    # Decorator form of span(); the function name is the default name
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_rerun(view):
+    # Open the record for a script run of `view` in this thread
+    if not ENABLED:
+        return
+    if getattr(_local, "rerun", None) is not None:
+        _finish(_local.rerun, "interrupted")
+    if MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if os.environ.get(PORT_ENV) and _server is None:
+        serve_metrics(int(os.environ[PORT_ENV]), os.environ.get(HOST_ENV) or "127.0.0.1")
+    _local.rerun = Rerun(view)
+
+
+def finish_rerun():
+    # Close the record opened by start_rerun(); returns it, or None
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    return _finish(rerun, "complete")
+
+
+def _finish(rerun, status):
+    _local.rerun = None
+    record = rerun.record(status)
+    with _lock:
+        history.append(record)
+        _add(("dashboard_rerun_seconds", (("view", rerun.view),)), record["seconds"])
+        for item in record["spans"]:
+            labels = (("view", rerun.view), ("stage", item["stage"]), ("span", item["name"]))
+            _add(("dashboard_span_seconds", labels), item["seconds"], item["calls"])
+            if item["peak"] is not None:
+                key = ("dashboard_span_peak_bytes", labels)
+                _totals[key] = max(_totals.get(key, 0), item["peak"])
+        path = os.environ.get(LOG_ENV)
+        if path:
+            with open(path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+    return record
+
+
+def _add(key, seconds, calls=1):
+    total = _totals.setdefault(key, [0.0, 0])
+    total[0] += seconds
+    total[1] += calls
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+def metrics():
+    # Totals since the process started, in the Prometheus text format
+    help_text = {
+        "dashboard_rerun_seconds": ("summary", "Script reruns per view"),
+        "dashboard_span_seconds": ("summary", "Exclusive time per instrumented step"),
+        "dashboard_span_peak_bytes": ("gauge", "Largest allocation peak of a step (tracemalloc)"),
+    }
+    with _lock:
+        items = sorted(_totals.items())
+    lines = []
+    for metric, (kind, text) in help_text.items():
+        rows = [(labels, value) for (name, labels), value in items if name == metric]
+        if not rows:
+            continue
+        lines += [f"# HELP {metric} {text}", f"# TYPE {metric} {kind}"]
+        for labels, value in rows:
+            if kind == "summary":
+                lines.append(f"{metric}_sum{_labels(labels)} {value[0]:.6f}")
+                lines.append(f"{metric}_count{_labels(labels)} {value[1]}")
+            else:
+                lines.append(f"{metric}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    # Serve metrics() on http://host:port/metrics from a daemon thread,
+    # once per process; only local clients unless `host` says otherwise
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with _lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            # port taken, e.g. by another server process: leave it to that one
+            _server = False
+            return None
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def debug_panel():
+    # Sidebar breakdown of the last reruns; only with ?debug=1 in the URL
+    import pandas as pd
+    import streamlit as st
+
+    if not ENABLED or st.query_params.get("debug") != "1":
+        return
+    with _lock:
+        records = list(history)
+    with st.expander(f"Profiel: laatste {len(records)} reruns"):
+        if not records:
+            return
+        st.dataframe(pd.DataFrame([
+            {"tijd": r["time"][11:], "weergave": r["view"], "status": r["status"],
+             "totaal (ms)": r["seconds"] * 1000,
+             **{f"{stage} (ms)": seconds * 1000 for stage, seconds in r["stages"].items()}}
+            for r in reversed(records)]).round(1), hide_index=True)
+
+        last = records[-1]
+        spans = pd.DataFrame(last["spans"], columns=["stage", "name", "seconds", "calls", "peak"])
+        spans["ms"] = (spans.pop("seconds") * 1000).round(1)
+        if not MEMORY:
+            spans = spans.drop(columns="peak")
+        st.caption(f"Stappen van de laatste rerun ({last['view']})")
+        st.dataframe(spans.sort_values("ms", ascending=False), hide_index=True)
+        if last.get("allocations"):
+            st.caption("Grootste geheugengroei per regel")
+            st.dataframe(pd.DataFrame(last["allocations"]), hide_index=True)
+
+
+if __name__ == "__main__":
+    # python profiling.py -> cost of a span switched off and on
+    import timeit
+
+    def step():
+        with span("filter"):
+            pass
+
+    calls = 200_000
+    off = timeit.timeit(step, number=calls)
+    ENABLED = True
+    start_rerun("bench")
+    on = timeit.timeit(step, number=calls)
+    finish_rerun()
+    print(f"off: {off / calls * 1e9:.0f} ns per span, on: {on / calls * 1e9:.0f} ns per span")
+    print(metrics())
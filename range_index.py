@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# Range filters for the dashboard sliders.
+#
+# Built once per dataset: for every filter column the row positions are
+# stored in sorted order, so the rows inside [lo, hi] are one contiguous
+# slice found by binary search. A query with several ranges starts from
+# the most selective column and checks the other columns only on that
+# candidate set, so the cost grows with the result size instead of
+# allocating full-length boolean masks for every column.
+
+
+class SortedRangeIndex:
+
+    def __init__(self, df, columns):
+        self.size = len(df)
+        self.columns = {}
+        for col in columns:
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind="stable")  # NaN/NaT sort last
+            self.columns[col] = (values[order], order, values)
+
+    def _bound(self, col, value):
+        sorted_values = self.columns[col][0]
+        if sorted_values.dtype.kind == "M":
+            return pd.Timestamp(value).to_datetime64().astype(sorted_values.dtype)
+        return value
+
+    def _slice(self, col, lo, hi, open_upper):
+        sorted_values = self.columns[col][0]
+        start = np.searchsorted(sorted_values, self._bound(col, lo), side="left")
+        stop = np.searchsorted(sorted_values, self._bound(col, hi),
+                               side="left" if open_upper else "right")
+        return start, stop
+
+    def positions(self, ranges, open_upper=()):
+        # Sorted row positions where lo <= df[col] <= hi for every
+        # col -> (lo, hi) in `ranges` (lo <= df[col] < hi for the columns
+        # listed in `open_upper`)
+        if not ranges:
+            return np.arange(self.size)
+
+        slices = {col: self._slice(col, lo, hi, col in open_upper) for col, (lo, hi) in ranges.items()}
+        first = min(slices, key=lambda col: slices[col][1] - slices[col][0])
+        start, stop = slices[first]
+        positions = self.columns[first][1][start:stop]
+
+        for col, (lo, hi) in ranges.items():
+            if col == first or len(positions) == 0:
+                continue
+            values = self.columns[col][2][positions]
+            lo, hi = self._bound(col, lo), self._bound(col, hi)
+            upper = values < hi if col in open_upper else values <= hi
+            positions = positions[(values >= lo) & upper]
+
+        return np.sort(positions)
+
+    def merged(self, df):
+        # New index over the indexed rows followed by the rows of `df`.
+        # Only the new values are sorted; they are merged into the sorted
+        # columns after equal old values, as a stable sort would place them.
+        index = SortedRangeIndex.__new__(SortedRangeIndex)
+        index.size = self.size + len(df)
+        index.columns = {}
+        for col, (sorted_values, order, values) in self.columns.items():
+            new = df[col].to_numpy()
+            dtype = np.result_type(sorted_values, new)
+            sorted_values, values, new = (a.astype(dtype, copy=False) for a in (sorted_values, values, new))
+            new_order = np.argsort(new, kind="stable")
+            at = np.searchsorted(sorted_values, new[new_order], side="right")
+            index.columns[col] = (np.insert(sorted_values, at, new[new_order]),
+                                  np.insert(order, at, new_order + self.size),
+                                  np.concatenate([values, new]))
+        return index
+
+    def filter(self, df, ranges, open_upper=()):
+        # Rows of `df` (the frame the index was built on) inside all ranges
+        return df.take(self.positions(ranges, open_upper))
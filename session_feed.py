@@ -0,0 +1,312 @@
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cubes import CountCube, step_edges
+from data_loader import DATASETS, complete_sessions, load_sessions, prepare, table_version
+from range_index import SortedRangeIndex
+from sessions import month_range
+
+# Incremental refresh of the charging sessions (fd2.csv).
+#
+# New sessions only ever arrive as rows appended to the export, with later
+# Started times than anything before them. A full load parses the whole
+# history on every change; SessionFeed parses it once and then follows the
+# file:
+#
+#   cursor      byte offset after the last complete line parsed
+#   mark        high-water mark: latest Started seen so far
+#
+# refresh() reads only the bytes after the cursor (up to the last complete
+# line), runs them through the same schema and cleaning as a full load,
+# drops rows that start before the mark (re-sent sessions) and merges the
+# rest into what is already there:
+#
+#   sessions    SessionChunks: the typed sessions as a few consecutive
+#               frames, each with its own SortedRangeIndex
+#   cube        bucket x month counts: new months and wattage bins are
+#               added, then only the new rows are counted in
+#   hours       sessions per start hour
+#
+# Parsing, cleaning and the counts cost O(new rows). The new rows become a
+# chunk of their own; a chunk is merged into the one before it (frame
+# appended, index merged without re-sorting) only once it holds at least
+# half as many rows, so every row is copied O(log(history / batch)) times
+# in total instead of once per refresh. The cube is copied per refresh; it
+# grows with the months and wattage bins covered, not with the rows. When
+# the file is replaced instead of appended to (it shrank or its head
+# changed) the feed rebuilds. The cursor only moves once a batch is
+# merged: when parsing fails, refresh() raises and leaves everything as it
+# was, and the next call reads the same bytes again.
+#
+# One feed is shared by all sessions of a server process. refresh() swaps
+# in new objects under a lock and never mutates ones handed out, so a
+# reader always sees a consistent snapshot(). The base chunk comes from
+# load_sessions() (shared memory) until enough rows arrived to merge into
+# it; from then on it is private to the process.
+#
+# The dashboard uses the feed when DASHBOARD_SESSION_FEED=1 and then checks
+# the file every REFRESH_SECONDS.
+
+HEAD_BYTES = 4096  # compared on every refresh to notice a replaced file
+INDEX_COLUMNS = ["Maxgevraagd(w)", "hour"]
+MERGE_RATIO = 2  # a chunk merges into the previous one at 1 / MERGE_RATIO its size
+REFRESH_SECONDS = 60  # how often the dashboard polls the file
+
+
+def use_feed():
+    return os.environ.get("DASHBOARD_SESSION_FEED") == "1"
+
+
+def session_cube(fd3, watt_step):
+    # bucket x month counts per start hour and wattage bin, so the
+    # Laadpaaldata heatmap never has to scan the sessions
+    return CountCube.from_frame(fd3, "bucket", "maand", {
+        "hour": np.arange(25),
+        "Maxgevraagd(w)": step_edges(fd3["Maxgevraagd(w)"], watt_step),
+    }, column_labels=month_range(fd3["maand"]))
+
+
+def hour_counts(df):
+    hours = df["hour"].to_numpy("float64", na_value=np.nan)
+    return np.bincount(hours[np.isfinite(hours)].astype("int64"), minlength=24)
+
+
+def _concat(frames):
+    # `frames` one after the other, keeping categorical columns categorical
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([part.astype("category").array for part in parts])
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    merged = pd.DataFrame(columns)
+    merged.attrs["validation"] = _chunk_reports(frames)
+    return merged
+
+
+def _chunk_reports(frames):
+    report = {}
+    for frame in frames:
+        report = _merge_reports(report, frame.attrs.get("validation", {}))
+    return report
+
+
+def _merge_reports(old, new):
+    report = {col: dict(counts) for col, counts in old.items()}
+    for col, counts in new.items():
+        total = report.setdefault(col, {"repaired": 0, "invalid": 0})
+        for key, value in counts.items():
+            total[key] = total.get(key, 0) + value
+    return report
+
+
+class SessionChunks:
+    # Sessions stored as consecutive (frame, SortedRangeIndex) chunks.
+    # Row positions count across the chunks, as in one concatenated frame.
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.offsets = np.cumsum([0] + [len(frame) for frame, _ in chunks])
+        self.attrs = {"validation": _chunk_reports([frame for frame, _ in chunks])}
+
+    @classmethod
+    def build(cls, frame):
+        return cls([(frame, SortedRangeIndex(frame, INDEX_COLUMNS))])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def appended(self, delta):
+        # New SessionChunks with `delta` after the last row; merges the
+        # newest chunks while the last one is not much smaller than the one
+        # before it
+        chunks = self.chunks + [(delta, SortedRangeIndex(delta, INDEX_COLUMNS))]
+        while len(chunks) > 1 and len(chunks[-1][0]) * MERGE_RATIO >= len(chunks[-2][0]):
+            (frame, index), (new, _) = chunks[-2:]
+            chunks[-2:] = [(_concat([frame, new]), index.merged(new))]
+        return SessionChunks(chunks)
+
+    def positions(self, ranges, open_upper=()):
+        # SortedRangeIndex.positions() over all chunks
+        return np.concatenate([index.positions(ranges, open_upper) + offset
+                               for (_, index), offset in zip(self.chunks, self.offsets)])
+
+    def filter(self, ranges, open_upper=()):
+        # Rows inside all ranges, labelled with their positions
+        taken = [frame.take(index.positions(ranges, open_upper)) for frame, index in self.chunks]
+        rows = _concat(taken)
+        rows.index = self.positions(ranges, open_upper)
+        return rows
+
+    def frame(self):
+        # All sessions as one frame (a full copy)
+        return _concat([frame for frame, _ in self.chunks])
+
+
+class SessionFeed:
+
+    def __init__(self, base_dir=".", watt_step=50):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, DATASETS["sessions"]["source"])
+        self.watt_step = watt_step
+        self.stats = {}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._rebuild()
+
+    def _head(self, size):
+        with open(self.path, "rb") as f:
+            return f.read(min(size, HEAD_BYTES))
+
+    def _rebuild(self):
+        # Full load; repeated if the file changed while it was being read
+        start = time.perf_counter()
+        while True:
+            size = os.path.getsize(self.path)
+            frame = load_sessions(self.base_dir)
+            if os.path.getsize(self.path) == size:
+                break
+        with open(self.path, "rb") as f:
+            self.columns = f.readline().decode().strip().split(";")
+
+        self.cursor = size
+        self.head = self._head(size)
+        self.base_version = table_version("sessions", self.base_dir)
+        self.sessions = SessionChunks.build(frame)
+        self.mark = frame["Started"].max()
+        self.cube = session_cube(frame, self.watt_step)
+        self.hours = hour_counts(frame)
+        self.stats = {"mode": "rebuild", "rows": len(frame), "late": 0,
+                      "seconds": time.perf_counter() - start}
+
+    @property
+    def version(self):
+        # Changes with every refresh that added rows; keys figure caches
+        return f"{self.base_version}-{len(self.sessions)}"
+
+    def snapshot(self):
+        # (version, sessions, cube, hours) from the same refresh
+        with self._lock:
+            return self.version, self.sessions, self.cube, self.hours
+
+    def _read_new(self, size):
+        # Complete lines between the cursor and `size`, or b""
+        with open(self.path, "rb") as f:
+            f.seek(self.cursor)
+            data = f.read(size - self.cursor)
+        return data[:data.rfind(b"\n") + 1]
+
+    def _parse(self, data):
+        spec = DATASETS["sessions"]
+        rows = pd.read_csv(io.BytesIO(data), header=None, names=self.columns, **spec["csv"])
+        return complete_sessions(prepare(rows, spec))
+
+    def refresh(self):
+        # Merge sessions appended since the last call; returns how many
+        # rows were added
+        with self._lock:
+            start = time.perf_counter()
+            size = os.path.getsize(self.path)
+            if size == self.cursor:
+                return 0
+            if size < self.cursor or self._head(size) != self.head:
+                self._rebuild()
+                return len(self.sessions)
+            data = self._read_new(size)
+            if not data:
+                return 0  # only a partial line so far
+
+            delta = self._parse(data)
+            late = delta["Started"] < self.mark
+            delta = delta[~late].reset_index(drop=True)
+            if len(delta):
+                self._merge(delta)
+            self.cursor += len(data)
+            self.stats = {"mode": "append", "rows": len(delta), "late": int(late.sum()),
+                          "seconds": time.perf_counter() - start}
+            return len(delta)
+
+    def _merge(self, delta):
+        cube = self.cube.copy()
+        watts = np.r_[cube.edges["Maxgevraagd(w)"][[0, -1]] - [0, self.watt_step],
+                      delta["Maxgevraagd(w)"].to_numpy("float64", na_value=np.nan)]
+        cube.grow(row_labels=sorted(delta["bucket"].dropna().unique()),
+                  column_labels=month_range(np.r_[cube.column_labels[-1:], delta["maand"]]),
+                  edges={"Maxgevraagd(w)": step_edges(watts, self.watt_step)})
+        cube.add(delta)
+        sessions = self.sessions.appended(delta)
+        hours = self.hours + hour_counts(delta)
+
+        # nothing is replaced until every structure was built
+        self.sessions, self.cube, self.hours = sessions, cube, hours
+        self.mark = max(self.mark, delta["Started"].max())
+
+
+if __name__ == "__main__":
+    # python session_feed.py [rows per append] -> replay fd2.csv, sorted by
+    # Started, as a live export: load half, append the rest in batches and
+    # compare every structure with a full rebuild of the same file
+    import sys
+    import tempfile
+
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    source = DATASETS["sessions"]["source"]
+    with open(source, "rb") as f:
+        header, *lines = f.read().splitlines(keepends=True)
+    started = pd.to_datetime([line.split(b";", 1)[0].decode() for line in lines],
+                             format="%d-%m-%Y %H:%M", errors="coerce")
+    lines = [lines[i] for i in np.argsort(started.to_numpy(), kind="stable")]
+    split = len(lines) // 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, source)
+        with open(path, "wb") as f:
+            f.write(header + b"".join(lines[:split]))
+        feed = SessionFeed(tmp)
+        print(f"initial load: {feed.stats['rows']} rows, {feed.stats['seconds'] * 1000:.0f} ms")
+
+        def failing_parse(data):
+            del feed._parse  # fail once, then the class' parser again
+            raise ValueError("simulated parse failure")
+
+        seconds = []
+        for at in range(split, len(lines), batch):
+            with open(path, "ab") as f:
+                f.write(b"".join(lines[at:at + batch]))
+            if at == split:
+                feed._parse = failing_parse
+                before = (feed.cursor, feed.version)
+                try:
+                    feed.refresh()
+                    raise AssertionError("parse failure was swallowed")
+                except ValueError:
+                    assert (feed.cursor, feed.version) == before, "failed batch moved the feed"
+                print("failed parse left the cursor in place; retried on the next refresh")
+            feed.refresh()
+            seconds.append(feed.stats["seconds"])
+        print(f"{len(seconds)} appends of {batch} rows: {np.mean(seconds) * 1000:.0f} ms each")
+
+        os.utime(path, ns=(0, 0))  # same bytes, new signature: forces a full load
+        full = SessionFeed(tmp)
+        print(f"full rebuild: {full.stats['rows']} rows, {full.stats['seconds'] * 1000:.0f} ms")
+
+        version, sessions, cube, hours = feed.snapshot()
+        print(f"{len(sessions.chunks)} chunks: {[len(frame) for frame, _ in sessions.chunks]} rows")
+        pd.testing.assert_frame_equal(sessions.frame(), full.sessions.frame(), check_categorical=False)
+        assert cube.column_labels == full.cube.column_labels
+        assert np.array_equal(cube.query({}).to_numpy(), full.cube.query({}).to_numpy())
+        assert np.array_equal(hours, full.hours)
+        ranges = {"Maxgevraagd(w)": (3000, 7000), "hour": (8, 17)}
+        assert np.array_equal(sessions.positions(ranges), full.sessions.positions(ranges))
+        pd.testing.assert_frame_equal(sessions.filter(ranges), full.sessions.filter(ranges),
+                                      check_categorical=False)
+        print("frame, cube, hours and index match the full rebuild")
@@ -0,0 +1,130 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# Load-time cleaning of the charging-session export (fd2.csv).
+#
+# The file uses decimal commas, which the loader already reads with
+# decimal=",". Some values lost their separator on export: Verbonden holds
+# 164371 where "Uren verbonden" says 164,37, and Echtladen has the same
+# problem next to "Uren echt geladen". clean_sessions() repairs those
+# against their rounded twin column and blanks values that are out of
+# range. The cleaned frame is what gets cached and converted, so the
+# interactive path never parses strings. Maxgevraagd(w) and hour are read
+# as floats so a blank field is NaN instead of a parse error; blanks in
+# those columns are counted as invalid like out-of-range values.
+#
+# Months are an integer index derived from Started (months since January
+# 1970) rather than the export's Maandjaar strings, so any number of years
+# bins the same way; month_label() turns an index back into "jan-24".
+
+SESSION_DTYPES = {
+    "Verbruikteenergie(Wh)": "float64",
+    "Verbonden": "float64",
+    "Echtladen": "float64",
+    "Maxgevraagd(w)": "float64",
+    "Bezettingsgraad": "float64",
+    "Uren verbonden": "float64",
+    "Uren echt geladen": "float64",
+    "Verbruikte energie WH accuraat": "float64",
+    "hour": "float64",
+}
+
+# column -> rounded reference column holding the same quantity
+SCALE_REPAIRS = {
+    "Verbonden": "Uren verbonden",
+    "Echtladen": "Uren echt geladen",
+}
+REPAIR_TOLERANCE = 0.01  # references are rounded to two decimals
+
+# column -> (min, max) of plausible values; anything outside becomes NaN
+VALID_RANGES = {
+    "Bezettingsgraad": (0, 100),
+    "Verbruikteenergie(Wh)": (0, None),
+    "Verbruikte energie WH accuraat": (0, None),
+    "Uren verbonden": (0, None),
+    "Uren echt geladen": (0, None),
+    "hour": (0, 23),
+    "Maxgevraagd(w)": (0, None),
+}
+
+# columns the views filter on: a blank value is reported as invalid
+REQUIRED_VALUES = ["Maxgevraagd(w)", "hour"]
+
+
+def repair_scale(values, reference, tolerance=REPAIR_TOLERANCE):
+    # Undo a lost decimal separator: divide by the power of ten that brings
+    # the value back onto `reference`. Values that cannot be matched fall
+    # back to the reference. Returns (repaired values, changed mask).
+    values = values.to_numpy(dtype="float64")
+    reference = reference.to_numpy(dtype="float64")
+    close = np.abs(values - reference) <= tolerance
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power = np.round(np.log10(values / reference))
+    power = np.where(np.isfinite(power) & (power > 0), power, 0)
+    rescaled = values / 10 ** power
+    matched = np.abs(rescaled - reference) <= tolerance
+
+    repaired = np.where(close, values, np.where(matched, rescaled, reference))
+    changed = ~close & ~(np.isnan(values) & np.isnan(reference))
+    return repaired, changed
+
+
+def clean_sessions(df):
+    report = {}
+
+    for col, reference in SCALE_REPAIRS.items():
+        if col in df.columns and reference in df.columns:
+            df[col], changed = repair_scale(df[col], df[reference])
+            report[col] = {"repaired": int(changed.sum()), "invalid": 0}
+
+    for col, (low, high) in VALID_RANGES.items():
+        if col not in df.columns:
+            continue
+        values = df[col]
+        invalid = (values < low) if low is not None else pd.Series(False, index=df.index)
+        if high is not None:
+            invalid |= values > high
+        if invalid.any():
+            df[col] = values.astype("float64").mask(invalid)
+        if col in REQUIRED_VALUES:
+            invalid |= values.isna()
+        report.setdefault(col, {"repaired": 0, "invalid": 0})["invalid"] = int(invalid.sum())
+
+    if "Started" in df.columns and "Ended" in df.columns:
+        reversed_ = df["Ended"] < df["Started"]
+        df.loc[reversed_, "Ended"] = pd.NaT
+        report["Ended"] = {"repaired": 0, "invalid": int(reversed_.sum())}
+
+    df.attrs["validation"] = report
+    return df
+
+
+MONTH_NAMES = ["jan", "feb", "mrt", "apr", "mei", "jun", "jul", "aug", "sep", "okt", "nov", "dec"]
+
+
+def month_index(started):
+    # Months since 1970-01 per timestamp as int32; NaT -> -1
+    months = started.to_numpy().astype("datetime64[M]")
+    return np.where(np.isnat(months), -1, months.astype("int64")).astype("int32")
+
+
+@functools.lru_cache(maxsize=None)
+def month_label(index):
+    year, month = divmod(int(index), 12)
+    return f"{MONTH_NAMES[month]}-{(1970 + year) % 100:02d}"
+
+
+def month_range(months):
+    # Every month index from the first to the last in `months`
+    months = np.asarray(months)
+    months = months[months >= 0]
+    return range(int(months.min()), int(months.max()) + 1) if len(months) else range(0)
+
+
+def validation_report(df):
+    # Per-column counts of repaired and invalidated values, if any
+    report = df.attrs.get("validation", {})
+    return pd.DataFrame.from_dict(report, orient="index", columns=["repaired", "invalid"])
@@ -0,0 +1,292 @@
+import atexit
+import errno
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Host-wide shared-memory store for the dashboard datasets.
+#
+# data_loader keeps one parsed frame per process, but every Streamlit
+# server process and every helper worker (brand_jobs) still held its own
+# copy. shared_frame() publishes a dataset version once per host into a
+# named multiprocessing.shared_memory block and builds frames whose
+# columns are read-only views into that block:
+#
+#   numbers, bools, datetimes   the NumPy array itself
+#   categoricals                the codes; categories travel in the manifest
+#   text                        Arrow large_string buffers (pyarrow), else
+#                               the values are pickled into the manifest;
+#                               the column comes back with its own dtype
+#                               (str keeps NaN, string[pyarrow] keeps <NA>)
+#
+# The first process that needs a version builds and publishes it; all
+# others attach. Attaching copies only the manifest, so memory stays at
+# one copy per host however many sessions or workers read the data.
+# Frames from the store must not be modified in place (pandas'
+# copy-on-write copies a column as soon as it is written).
+#
+# Layout: READY flag (8 bytes), manifest length (8 bytes), pickled
+# manifest, then the column buffers at ALIGN-byte offsets from the first
+# aligned byte after the manifest. The creator sets READY last, so a
+# concurrent attach never sees a half-written block. The creating process
+# owns the block: it unlinks the name when it exits or publishes a newer
+# version of the dataset. Processes still attached keep their mapping;
+# later ones publish again.
+
+PREFIX = "evd"
+ALIGN = 64
+READY = 0x45564453484D3031  # b"EVDSHM01"
+HEADER = struct.Struct("<QQ")
+ATTACH_TIMEOUT = 60  # seconds to wait for another process to finish publishing
+
+_blocks = {}     # (name, version) -> SharedMemory attached by this process
+_frames = {}     # (name, version) -> frame over that block
+_created = {}    # name -> (version, SharedMemory) this process published
+_lock = threading.RLock()
+
+
+class _Block(shared_memory.SharedMemory):
+    # Column views may still point into the block when it is collected at
+    # interpreter exit; the OS releases the mapping then anyway
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+
+def block_name(name, version):
+    return f"{PREFIX}_{name}_{version}"
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _column_parts(values):
+    # (manifest entry, [buffers]) for one column
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = np.ascontiguousarray(values.cat.codes.to_numpy())
+        return {"kind": "category", "categories": dtype.categories, "ordered": dtype.ordered,
+                "dtype": codes.dtype.str}, [codes]
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        array = np.ascontiguousarray(values.to_numpy())
+        return {"kind": "numpy", "dtype": array.dtype.str}, [array]
+    pickled = {"kind": "pickled", "values": values.array}
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return pickled, []
+    try:
+        strings = pa.array(values.to_numpy(dtype=object), type=pa.large_string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pickled, []  # not text (e.g. geometry objects)
+    buffers = strings.buffers()
+    entry = {"kind": "string", "dtype": dtype, "null_count": strings.null_count,
+             "offset": strings.offset, "validity": buffers[0] is not None}
+    return entry, [np.frombuffer(b, dtype=np.uint8) for b in buffers if b is not None]
+
+
+def _check_space(size):
+    # Writing past the free space of a tmpfs /dev/shm kills the process
+    # with SIGBUS instead of raising, so refuse up front
+    try:
+        stat = os.statvfs("/dev/shm")
+    except (OSError, AttributeError):
+        return
+    if stat.f_bavail * stat.f_frsize < size:
+        raise OSError(errno.ENOSPC, f"shared_store: {size} bytes do not fit in /dev/shm")
+
+
+def publish(name, version, df):
+    # Copy `df` into a new shared block; FileExistsError if it is there already
+    columns, buffers = [], []
+    for col in df.columns:
+        entry, parts = _column_parts(df[col])
+        entry["name"] = col
+        columns.append(entry)
+        buffers.append(parts)
+
+    offset = 0
+    for entry, parts in zip(columns, buffers):
+        entry["buffers"] = []
+        for part in parts:
+            offset = _aligned(offset)
+            entry["buffers"].append((offset, part.nbytes))
+            offset += part.nbytes
+    manifest = {"length": len(df), "columns": columns, "attrs": df.attrs, "index": df.index}
+    payload = pickle.dumps(manifest, protocol=pickle.HIGHEST_PROTOCOL)
+    data = _aligned(HEADER.size + len(payload))
+
+    _check_space(data + offset)
+    block = _Block(name=block_name(name, version), create=True, size=data + max(offset, 1))
+    try:
+        block.buf[HEADER.size:HEADER.size + len(payload)] = payload
+        for entry, parts in zip(columns, buffers):
+            for (start, nbytes), part in zip(entry["buffers"], parts):
+                block.buf[data + start:data + start + nbytes] = part.view(np.uint8).reshape(-1)
+        block.buf[:HEADER.size] = HEADER.pack(READY, len(payload))
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    return block
+
+
+def _open(name):
+    # Attach without registering with the resource tracker: on Python
+    # < 3.13 an attaching process would otherwise unlink the block on exit
+    if sys.version_info >= (3, 13):
+        return _Block(name=name, track=False)
+    with _lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return _Block(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _view(block, data, buffer, dtype, length):
+    array = np.frombuffer(block.buf, dtype=np.dtype(dtype), offset=data + buffer[0], count=length)
+    array.flags.writeable = False
+    return array
+
+
+def _column(block, data, entry, length):
+    kind = entry["kind"]
+    if kind == "numpy":
+        return _view(block, data, entry["buffers"][0], entry["dtype"], length)
+    if kind == "category":
+        codes = _view(block, data, entry["buffers"][0], entry["dtype"], length)
+        dtype = pd.CategoricalDtype(entry["categories"], ordered=entry["ordered"])
+        return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    if kind == "string":
+        import pyarrow as pa
+
+        views = [pa.py_buffer(block.buf[data + offset:data + offset + nbytes])
+                 for offset, nbytes in entry["buffers"]]
+        if not entry["validity"]:
+            views.insert(0, None)
+        strings = pa.Array.from_buffers(pa.large_string(), length, views,
+                                        null_count=entry["null_count"], offset=entry["offset"])
+        dtype = entry["dtype"]
+        if isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow":
+            return pd.arrays.ArrowStringArray(pa.chunked_array([strings]), dtype=dtype)
+        # object or python-backed text is rebuilt in process memory
+        values = strings.to_numpy(zero_copy_only=False)
+        return values if isinstance(dtype, np.dtype) else pd.array(values, dtype=dtype)
+    return entry["values"]
+
+
+def attach(name, version, timeout=ATTACH_TIMEOUT):
+    # Frame for a published version; FileNotFoundError when there is none
+    block = _open(block_name(name, version))
+    deadline = time.monotonic() + timeout
+    while True:
+        ready, size = HEADER.unpack(bytes(block.buf[:HEADER.size]))
+        if ready == READY:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"shared_store: {block_name(name, version)} was never completed")
+        time.sleep(0.05)
+    manifest = pickle.loads(block.buf[HEADER.size:HEADER.size + size])
+    data = _aligned(HEADER.size + size)
+    frame = pd.DataFrame(
+        {entry["name"]: _column(block, data, entry, manifest["length"]) for entry in manifest["columns"]},
+        index=manifest["index"], copy=False)
+    objects = {entry["name"]: entry["dtype"] for entry in manifest["columns"]
+               if entry["kind"] == "string" and isinstance(entry["dtype"], np.dtype)}
+    if objects:
+        # the constructor infers str for object text; keep the published dtype
+        frame = frame.astype(objects)
+    frame.attrs.update(manifest["attrs"])
+    return block, frame
+
+
+def shared_frame(name, version, build=None):
+    # `name` at `version` from shared memory. `build()` runs only when no
+    # process on this host has published that version yet; without
+    # `build` a missing version raises FileNotFoundError. When the block
+    # cannot be created (e.g. /dev/shm too small) the built frame is kept
+    # privately in this process instead.
+    with _lock:
+        key = (name, version)
+        if key in _frames:
+            return _frames[key]
+        block = None
+        try:
+            block, frame = attach(name, version)
+        except FileNotFoundError:
+            if build is None:
+                raise
+            frame = build()
+            try:
+                created = publish(name, version, frame)
+            except FileExistsError:
+                created = None  # another process won the race
+            except OSError:
+                created = False
+            if created is not False:
+                block, frame = attach(name, version)
+            if isinstance(created, shared_memory.SharedMemory):
+                _release(name)
+                _created[name] = (version, created)
+        _release(name, keep=version)
+        if block is not None:
+            _blocks[key] = block
+        _frames[key] = frame
+        return frame
+
+
+def _release(name, keep=None):
+    # Drop this process' references to other versions of `name` and unlink
+    # the one it published; frames still in use keep their mapping alive
+    for key in [key for key in _frames if key[0] == name and key[1] != keep]:
+        _frames.pop(key)
+        _blocks.pop(key, None)
+    version, created = _created.get(name, (None, None))
+    if created is not None and version != keep:
+        del _created[name]
+        created.unlink()
+
+
+@atexit.register
+def _unlink_created():
+    with _lock:
+        for name in list(_created):
+            _release(name)
+
+
+if __name__ == "__main__":
+    # python shared_store.py -> dtype round trip through a shared block
+    sample = pd.DataFrame({
+        "float": [1.5, np.nan, 3.0],
+        "int": np.arange(3),
+        "when": pd.to_datetime(["2024-01-01", None, "2024-03-01"]),
+        "category": pd.Categorical(["a", None, "b"]),
+        "str": pd.Series(["x", None, "z"], dtype="str"),
+        "string": pd.Series(["x", None, "z"], dtype="string[pyarrow]"),
+        "string_python": pd.Series(["x", None, "z"], dtype="string[python]"),
+        "object": pd.Series(["x", None, "z"], dtype=object),
+    })
+    version = str(os.getpid())
+    block = publish("roundtrip", version, sample)
+    try:
+        _, frame = attach("roundtrip", version)
+        assert frame.dtypes.equals(sample.dtypes), pd.concat([sample.dtypes, frame.dtypes], axis=1)
+        for col in sample.columns:
+            assert frame[col].isna().equals(sample[col].isna()), col
+        print(f"{len(sample.columns)} columns round-trip with their dtypes and missing values:")
+        print(frame.dtypes.to_string())
+        print(frame.loc[1].to_string())
+    finally:
+        block.unlink()
@@ -0,0 +1,124 @@
+import numpy as np
+
+# Charger points joined to the municipality polygons in the app.
+#
+# df_muni.csv (chargers and avg_power per municipality) and the
+# municipality/province/index_right columns of gdf_points.csv came from a
+# join done offline, so the choropleth showed all chargers whatever the
+# Conn_PowerKW slider said, and a new OpenChargeMap dump could not be
+# aggregated. MunicipalityJoin does the join itself:
+#
+#   build       one STRtree over the gdf_munis polygons, queried with all
+#               points at once (predicate "intersects", like sjoin); a point
+#               on a shared border goes to the first polygon, points outside
+#               every polygon (offshore) to none. Runs once per dataset
+#               version: the result is a municipality row per point.
+#   aggregate   per-municipality chargers, mean and max Conn_PowerKW and DC
+#               share for any subset of points (the slider positions from
+#               SortedRangeIndex), with bincount over the row per point:
+#               O(points in the subset), no geometry involved.
+#
+# `python spatial_join.py [data dir]` times both and checks the result
+# against the offline join.
+
+MUNI_COLUMNS = ["GID_2", "NAME_1", "NAME_2"]
+
+
+def point_in_polygon(lon, lat, polygons):
+    # Row of `polygons` (shapely geometries) containing each point, -1
+    # where none does
+    import shapely
+
+    points = shapely.points(np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64"))
+    point_rows, polygon_rows = shapely.STRtree(polygons).query(points, predicate="intersects")
+    order = np.lexsort((polygon_rows, point_rows))
+    point_rows, polygon_rows = point_rows[order], polygon_rows[order]
+    first = np.unique(point_rows, return_index=True)[1]
+
+    rows = np.full(len(points), -1, dtype=np.int32)
+    rows[point_rows[first]] = polygon_rows[first]
+    return rows
+
+
+class MunicipalityJoin:
+
+    def __init__(self, points, munis, lat="AddressInfo.Latitude", lon="AddressInfo.Longitude",
+                 power="Conn_PowerKW", current="Conn_CurrentType.Title"):
+        self.munis = munis[MUNI_COLUMNS].reset_index(drop=True)
+        self.rows = point_in_polygon(points[lon], points[lat], munis.geometry.to_numpy())
+        self.power = points[power].to_numpy("float64", na_value=np.nan)
+        current = points[current]
+        self.known = current.notna().to_numpy()
+        self.dc = (current == "DC").to_numpy(dtype=bool, na_value=False)
+
+    @property
+    def unmatched(self):
+        # points that lie in no municipality
+        return int((self.rows < 0).sum())
+
+    def aggregate(self, positions=None):
+        # Per municipality (a row each, in gdf_munis order): chargers, mean
+        # and max power, and DC share of those with a known current type,
+        # over the points at `positions` (all points when None)
+        take = slice(None) if positions is None else positions
+        rows, power = self.rows[take], self.power[take]
+        known, dc = self.known[take], self.dc[take]
+        inside = rows >= 0
+        rows, power, known, dc = rows[inside], power[inside], known[inside], dc[inside]
+
+        n = len(self.munis)
+        powered = ~np.isnan(power)
+        power_count = np.bincount(rows[powered], minlength=n)
+        power_sum = np.bincount(rows[powered], weights=power[powered], minlength=n)
+        max_power = np.full(n, -np.inf)
+        np.maximum.at(max_power, rows[powered], power[powered])
+        known_count = np.bincount(rows, weights=known, minlength=n)
+        dc_count = np.bincount(rows, weights=dc, minlength=n)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.munis.assign(
+                chargers=np.bincount(rows, minlength=n),
+                avg_power=power_sum / power_count,
+                max_power=np.where(power_count > 0, max_power, np.nan),
+                dc_share=dc_count / known_count,
+            )
+
+
+if __name__ == "__main__":
+    # python spatial_join.py [data dir] -> join and aggregate time, and the
+    # full aggregate compared with the offline join (df_muni.csv)
+    import sys
+    import time
+
+    from data_loader import load_openchargemap
+    from municipality_names import MunicipalityNames
+    from range_index import SortedRangeIndex
+
+    base_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    data = load_openchargemap(base_dir)
+    points = data.gdf_points
+
+    start = time.perf_counter()
+    join = MunicipalityJoin(points, data.gdf_munis)
+    print(f"join: {len(points)} points, {len(join.munis)} municipalities, "
+          f"{join.unmatched} outside, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    index = SortedRangeIndex(points, ["Conn_PowerKW"])
+    low, high = points["Conn_PowerKW"].quantile([0.25, 0.9])
+    start = time.perf_counter()
+    for _ in range(100):
+        join.aggregate(index.positions({"Conn_PowerKW": (low, high)}))
+    print(f"filter + aggregate: {(time.perf_counter() - start) * 10:.2f} ms")
+
+    if "index_right" in points.columns:
+        offline = points["index_right"].to_numpy("float64", na_value=np.nan)
+        matched = ~np.isnan(offline)
+        print(f"same municipality as the offline join: "
+              f"{(join.rows[matched] == offline[matched]).mean():.2%} of its points")
+        full = join.aggregate().set_index("GID_2")["chargers"]
+        codes = MunicipalityNames(data.gdf_munis).resolve(data.df_muni["province"])[0]
+        muni = data.df_muni.assign(GID_2=codes.to_numpy()).dropna(subset=["GID_2"])
+        muni = muni.set_index("GID_2")["chargers"]
+        differ = (full[muni.index] != muni).sum()
+        print(f"df_muni.csv: {len(muni)} of {len(data.df_muni)} municipalities resolved to "
+              f"a GID_2, {differ} with a different charger count")
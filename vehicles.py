@@ -0,0 +1,249 @@
+import csv
+import os
+import re
+import warnings
+
+import pandas as pd
+
+# Loader for the RDW vehicle registration export (elektrischeautos5.csv).
+#
+# The file used to be read with engine='python', which is slow on a file
+# of this size and silently drops malformed lines. Here the column types
+# are fixed up front and the pyarrow parser is used (the C parser when
+# pyarrow is not installed). Lines with too many or too few fields are
+# rejected by either parser and listed, with their line number, in a side
+# report next to the source file instead of disappearing.
+
+VEHICLE_DTYPES = {
+    "kenteken": "string",
+    "merk": "category",
+    "handelsbenaming": "category",
+    "klasse_hybride_elektrisch_voertuig": "category",
+    "voertuigsoort": "category",
+    "brandstof_omschrijving": "category",
+    "catalogusprijs": "float64",
+    "maximale_constructiesnelheid": "float64",
+    "massa_rijklaar": "float64",
+    "geluidsniveau_rijdend": "float64",
+}
+
+# Compact in-memory dtypes (compact.compact_frame): text with few distinct
+# values as categories, speed/mass/price as float32 (they have gaps),
+# small integers in the smallest exact type
+VEHICLE_COMPACT = {
+    "kenteken": "string",
+    "merk": "category",
+    "handelsbenaming": "category",
+    "klasse_hybride_elektrisch_voertuig": "category",
+    "voertuigsoort": "category",
+    "brandstof_omschrijving": "category",
+    "catalogusprijs": "float32",
+    "maximale_constructiesnelheid": "float32",
+    "massa_rijklaar": "float32",
+    "geluidsniveau_rijdend": "int16",
+    "brandstof_volgnummer": "uint8",
+    "jaar": "uint16",
+}
+
+DATE_COLUMNS = {
+    "datum_eerste_tenaamstelling_in_nederland": "%Y-%m-%d",
+    "datum_eerste_toelating": "%Y-%m-%d",
+    "datum_tenaamstelling": "%Y-%m-%d",
+}
+
+REJECTED_SUFFIX = ".rejected.csv"
+
+
+def rejected_path(path):
+    return os.path.splitext(path)[0] + REJECTED_SUFFIX
+
+
+def _header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def _scan_bad_rows(path, expected):
+    # Rows whose field count differs from the header, as (report entries,
+    # record indices for skiprows). pyarrow does not number the rows it
+    # rejects and the C parser pads short rows with NaN, so both readers
+    # take their rejected rows from this scan.
+    rejected, skip = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        lines = []
+
+        def source():
+            for line in f:
+                lines.append(line)
+                yield line
+
+        reader = csv.reader(source())
+        start = 1
+        for record, fields in enumerate(reader):
+            text = "".join(lines).rstrip("\r\n")
+            lines.clear()
+            if fields and len(fields) != expected:
+                rejected.append({"line": start, "reason": f"expected {expected} fields, saw {len(fields)}",
+                                 "text": text})
+                skip.append(record)
+            start = reader.line_num + 1
+    return rejected, skip
+
+
+def _read_pyarrow(path, dtype, header):
+    bad = []
+
+    def on_bad_line(row):
+        bad.append(row)
+        return "skip"
+
+    df = pd.read_csv(path, engine="pyarrow", dtype=dtype, on_bad_lines=on_bad_line)
+    # Only files with bad rows pay for the scan that finds their lines
+    rejected = _scan_bad_rows(path, len(header))[0] if bad else []
+    return df, rejected
+
+
+def _parser_warnings(caught):
+    # The C parser reports bad lines as "Skipping line N: expected X fields, saw Y"
+    rejected = []
+    for warning in caught:
+        for line, reason in re.findall(r"Skipping line (\d+): (.*)", str(warning.message)):
+            rejected.append({"line": int(line), "reason": reason.strip(), "text": None})
+    return rejected
+
+
+def _read_c(path, dtype, header):
+    rejected, skip = _scan_bad_rows(path, len(header))
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.ParserWarning)
+        df = pd.read_csv(path, engine="c", dtype=dtype, on_bad_lines="warn", skiprows=skip or None,
+                         skip_blank_lines=True, low_memory=False)
+    return df, rejected + _parser_warnings(caught)
+
+
+def _write_rejected(path, rejected):
+    report = rejected_path(path)
+    if rejected:
+        pd.DataFrame(rejected, columns=["line", "reason", "text"]).to_csv(report, index=False)
+    elif os.path.exists(report):
+        os.remove(report)
+
+
+def read_vehicle_csv(path):
+    header = _header(path)
+    dtype = {col: kind for col, kind in VEHICLE_DTYPES.items() if col in header}
+
+    try:
+        import pyarrow  # noqa: F401
+        df, rejected = _read_pyarrow(path, dtype, header)
+    except ImportError:
+        df, rejected = _read_c(path, dtype, header)
+
+    _write_rejected(path, rejected)
+
+    for col, fmt in DATE_COLUMNS.items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format=fmt, errors="coerce")
+    return df
+
+
+def rejected_lines(path):
+    # Side report of the lines the last load skipped, or None
+    report = rejected_path(path)
+    if not os.path.exists(report):
+        return None
+    return pd.read_csv(report)
+
+
+# Streaming mode
+#
+# For registration files that do not fit in memory the CSV is read in
+# chunks of STREAM_CHUNKSIZE rows, restricted to the columns the dashboard
+# uses. Each chunk is collapsed into counts per (brand, model, class, year,
+# month, top speed, mass bin, price bin), and the partial tables are merged
+# as they grow. Peak memory depends on the chunk size and the number of
+# distinct keys, not on the number of registrations.
+#
+# The result has one row per key with the same column names as the full
+# frame plus `aantal` (the number of vehicles it stands for):
+# datum_eerste_toelating is the first day of the month, massa_rijklaar the
+# mass bin and catalogusprijs the mean price of the group.
+
+STREAM_COLUMNS = [
+    "merk", "handelsbenaming", "catalogusprijs", "maximale_constructiesnelheid",
+    "massa_rijklaar", "datum_eerste_toelating", "jaar", "klasse_hybride_elektrisch_voertuig",
+]
+STREAM_KEYS = [
+    "merk", "handelsbenaming", "klasse_hybride_elektrisch_voertuig", "jaar",
+    "datum_eerste_toelating", "maximale_constructiesnelheid", "massa_rijklaar", "prijsklasse",
+]
+STREAM_CHUNKSIZE = 250_000
+STREAMING_THRESHOLD = 512 * 1024 ** 2  # files above this size are streamed
+MASS_BIN = 50      # kg
+PRICE_BIN = 5_000  # euro
+
+
+def use_streaming(path):
+    return (os.environ.get("DASHBOARD_VEHICLE_STREAMING") == "1"
+            or os.path.getsize(path) > STREAMING_THRESHOLD)
+
+
+def _aggregate_chunk(chunk):
+    for col in ["catalogusprijs", "maximale_constructiesnelheid", "massa_rijklaar", "jaar"]:
+        chunk[col] = pd.to_numeric(chunk[col], errors="coerce", downcast="float")
+
+    toelating = pd.to_datetime(chunk["datum_eerste_toelating"], format="%Y-%m-%d", errors="coerce")
+    chunk["datum_eerste_toelating"] = toelating.dt.to_period("M").dt.to_timestamp()
+    chunk["massa_rijklaar"] = (chunk["massa_rijklaar"] // MASS_BIN) * MASS_BIN
+    chunk["prijsklasse"] = (chunk["catalogusprijs"] // PRICE_BIN).astype("float32")
+
+    grouped = chunk.groupby(STREAM_KEYS, dropna=False, sort=False)["catalogusprijs"]
+    return pd.DataFrame({
+        "aantal": grouped.size(),
+        "prijs_som": grouped.sum(),
+        "prijs_n": grouped.count(),
+    })
+
+
+def _merge(parts):
+    merged = pd.concat(parts)
+    if len(parts) == 1:
+        return merged
+    return merged.groupby(level=list(range(merged.index.nlevels)), dropna=False, sort=False).sum()
+
+
+def stream_vehicle_aggregates(path, chunksize=STREAM_CHUNKSIZE):
+    header = _header(path)
+    usecols = [col for col in STREAM_COLUMNS if col in header]
+    text_cols = {col: "string" for col in ["merk", "handelsbenaming", "klasse_hybride_elektrisch_voertuig"]}
+
+    parts = []
+    pending = 0
+    rejected = []
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.ParserWarning)
+        reader = pd.read_csv(path, usecols=usecols, dtype=text_cols, chunksize=chunksize,
+                             engine="c", on_bad_lines="warn")
+        for chunk in reader:
+            for col in STREAM_COLUMNS:
+                if col not in chunk.columns:
+                    chunk[col] = float("nan")
+            part = _aggregate_chunk(chunk)
+            parts.append(part)
+            pending += len(part)
+            # Keep the partial tables bounded by merging them regularly
+            if pending > 2 * chunksize:
+                parts = [_merge(parts)]
+                pending = len(parts[0])
+        rejected = _parser_warnings(caught)
+    _write_rejected(path, rejected)
+
+    if not parts:
+        return pd.DataFrame(columns=STREAM_COLUMNS + ["aantal"])
+
+    frame = _merge(parts).reset_index()
+    frame["catalogusprijs"] = (frame["prijs_som"] / frame["prijs_n"].where(frame["prijs_n"] > 0)).astype("float32")
+    frame["aantal"] = frame["aantal"].astype("int32")
+    for col in ["merk", "handelsbenaming", "klasse_hybride_elektrisch_voertuig"]:
+        frame[col] = frame[col].astype("category")
+    return frame.drop(columns=["prijs_som", "prijs_n", "prijsklasse"])
@@ -0,0 +1,18 @@
+import streamlit as st
+
+from figure_cache import cached_figure
+from profiling import span
+
+# One module per dashboard view, each with a show() that draws it.
+#
+# app.py imports only the selected view, and the views import their heavy
+# libraries (folium for the map, matplotlib and seaborn for the charts)
+# inside show(), after the title is on screen. A fresh server process or
+# a session that only opens Laadpaaldata never loads folium or geopandas.
+
+
+def show_chart(key, draw):
+    # Chart image from the figure cache; `draw` only runs on a miss
+    image = cached_figure(key, draw)
+    with span("serialize", "st_image"):
+        st.image(image, width="stretch")
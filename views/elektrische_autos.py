@@ -0,0 +1,363 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from brand_jobs import (MODEL_FLOOR, MODEL_THRESHOLD, brand_inputs, date_grid, jobs as brand_jobs,
+                        job_frame, select_models)
+from charts import RASTER_THRESHOLD, rasterized_scatter, weighted_boxplot
+from compact import compact_frame, memory_report
+from data_loader import VEHICLE_FILES, read_vehicles, table_available, table_version
+from fetch import fetch
+from popularity import ModelPopularity
+from profiling import span
+from range_index import SortedRangeIndex
+from shared_store import shared_frame
+from vehicles import VEHICLE_COMPACT, rejected_lines, stream_vehicle_aggregates, use_streaming
+from views import show_chart
+
+# Elektrische autos view: the RDW vehicle export filtered by price,
+# registration date and top speed, with per-brand model charts.
+
+DRIVE_URL = "https://drive.google.com/uc?id=18PefqMveefnbdKbincQeW6O8IBbcPSPw"
+
+SETUP_HELP = f"""
+Het RDW-bestand `elektrischeautos5.csv` is niet gevonden: geen data-mirror,
+geen gecachte kopie en geen bestand in de werkmap.
+
+1. Download het bestand van {DRIVE_URL} en zet het in de werkmap, of
+2. maak er een mirror van met
+   `python fetch.py build mirror elektrischeautos5.csv --version <datum>`
+   en/of wijs `DASHBOARD_DATA_SOURCE` naar een bestaande mirror (map of
+   http(s)-URL met `manifest.json`).
+"""
+
+
+def show():
+    st.markdown(
+    """
+    <style>
+    .block-container {
+        max-width: 1200px;
+        padding-left: 2rem;
+        padding-right: 2rem;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+    )
+    
+    st.title('Elektrische autos dashboard')
+
+    # Chart libraries are only needed by the chart views
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme()
+    
+    # The export comes from the data mirror (fetch.py), preferably already
+    # converted to Arrow, into a verified versioned cache directory; the
+    # mirror is checked at most once per hour. Without a mirror or cached
+    # copy the export in the working directory is used, else the bundled
+    # elektrischeautos3.xlsx subset.
+    @st.cache_resource(ttl=3600, show_spinner=False)
+    def vehicles_dir():
+        bar = None
+
+        def progress(path, done, total):
+            nonlocal bar
+            bar = bar or st.progress(0.0)
+            bar.progress(done / total, f"{path} ophalen: {done / 1e6:.0f} / {total / 1e6:.0f} MB")
+
+        try:
+            version_dir, _ = fetch(VEHICLE_FILES, progress=progress)
+        except (OSError, ValueError):
+            version_dir = None
+        if bar is not None:
+            bar.empty()
+        return version_dir
+
+    data_dir, table = vehicles_dir(), "vehicles"
+    if data_dir is None:
+        data_dir = "."
+        if not table_available("vehicles", data_dir):
+            if not table_available("vehicles_xlsx", data_dir):
+                st.error(SETUP_HELP)
+                return
+            table = "vehicles_xlsx"
+            st.warning("`elektrischeautos5.csv` ontbreekt: de kleinere meegeleverde "
+                       "`elektrischeautos3.xlsx` wordt getoond (zonder massa_rijklaar).")
+            with st.expander("Volledige dataset instellen"):
+                st.markdown(SETUP_HELP)
+    output = os.path.join(data_dir, "elektrischeautos5.csv")
+
+    def load_data():
+        # One copy per host in shared memory (shared_store.py), attached by
+        # every session, server process and brand job worker; built once
+        version = table_version(table, data_dir)
+
+        # Files too large for memory are streamed into per-group counts
+        # (one row per group, `aantal` vehicles each)
+        if os.path.exists(output) and use_streaming(output):
+            return shared_frame("vehicles_stream", version, lambda: compact_frame(
+                stream_vehicle_aggregates(output), VEHICLE_COMPACT)).copy(deep=False)
+    
+        # Converted Arrow file when available (python convert_data.py),
+        # otherwise the CSV with the same schema; dates are parsed and
+        # dtypes compacted here, before publishing
+        df_faainal = shared_frame(table, version, lambda: read_vehicles(table, data_dir))
+
+        #df_faainal = df_faainal.iloc[:, :15]
+    
+        return df_faainal.copy(deep=False)
+
+        
+    with span("load", "vehicles"):
+        df_faainal = load_data()
+
+    @st.cache_resource(max_entries=2)
+    def vehicles_index(version):
+        return SortedRangeIndex(load_data(), [
+            "catalogusprijs", "datum_eerste_toelating", "maximale_constructiesnelheid"])
+
+    # (merk, handelsbenaming) counts and rows, plus the per-brand job
+    # inputs in shared memory and their date grid, once per dataset
+    @st.cache_resource(max_entries=2)
+    def vehicles_popularity(version):
+        df = load_data()
+        popularity = ModelPopularity(df, "aantal" if "aantal" in df.columns else None)
+        source = ("vehicle_jobs_stream" if "aantal" in df.columns else "vehicle_jobs", version)
+        inputs = shared_frame(*source, lambda: job_frame(df))
+        return popularity, source, inputs, date_grid(inputs["days"].to_numpy())
+
+    streaming = "aantal" in df_faainal.columns
+
+    rejected = rejected_lines(output)
+    if rejected is not None:
+        with st.expander(f"⚠️ {len(rejected)} onleesbare regels overgeslagen"):
+            st.dataframe(rejected)
+
+    memory = memory_report(df_faainal)
+    if not memory.empty:
+        with st.expander(f"Geheugengebruik: {memory.loc['totaal', 'after'] / 1e6:.1f} MB "
+                         f"({memory.loc['totaal', 'factor']}x kleiner)"):
+            st.dataframe(memory)
+###########################################################
+#    filtered_df2 = df_faainal[
+#        (df_faainal["catalogusprijs"] > 100000) &
+#        (df_faainal["maximale_constructiesnelheid"] > 250)
+#    ].copy()
+#    
+#    filtered_df2 = filtered_df2.groupby('handelsbenaming').filter(lambda x: len(x) > 2)
+###############################################################
+
+    min_date3 = 10000
+    max_date3 = 500000
+    
+    min_date4 = df_faainal["datum_eerste_toelating"].min().to_pydatetime()
+    max_date4 = df_faainal["datum_eerste_toelating"].max().to_pydatetime()
+
+    min_date5 = float(df_faainal["maximale_constructiesnelheid"].min())
+    max_date5 = float(df_faainal["maximale_constructiesnelheid"].max())
+
+    #min_date6 = df_faainal.groupby('handelsbenaming').filter(lambda x: len(x).min()
+    #max_date6 = df_faainal.groupby('handelsbenaming').filter(lambda x: len(x).max()
+
+    # Use the datetime objects directly in the slider
+    range_ts3 = st.slider(
+        "Selecteer catalogusprijs (€)",
+        min_value=min_date3, #to_pydatetime()
+        max_value=max_date3, #to_pydatetime() 
+        value=(min_date3, max_date3)
+        #format="DD-MM-YYYY"
+    )
+
+    range_ts4 = st.slider(
+        "Datum eerste toelating",
+        min_value=(min_date4),
+        max_value=(max_date4),
+        value=(min_date4, max_date4),
+        format="YYYY-MM-DD"
+    )
+
+    range_ts5 = st.slider(
+        "Maximale snelheid (km/h)",
+        min_value=(min_date5),
+        max_value=(max_date5),
+        value=(min_date5, max_date5)
+        #format="YYYY-MM-DD"
+    )
+     #range_ts6 = st.slider(
+     #   "Datum eerste toelating",
+     #   min_value=(min_date4),
+     #   max_value=(max_date4),
+     #   value=(min_date4), (max_date4))
+     #   format="YYYY-MM-DD"
+     #)
+
+    
+    def vehicles_key(*ranges):
+        return (table_version(table, data_dir), streaming) + tuple(ranges)
+
+    def vehicle_positions(start3, end3, start4, end4, start5, end5):
+        return vehicles_index(table_version(table, data_dir)).positions({
+            "catalogusprijs": (start3, end3),
+            "datum_eerste_toelating": (start4, end4),
+            "maximale_constructiesnelheid": (start5, end5)})
+
+    popularity, job_source, job_inputs, date_grid_days = vehicles_popularity(table_version(table, data_dir))
+
+    # Per-brand charts for the initial slider state are precomputed for
+    # every merk on a process pool as soon as the data is loaded; the key
+    # is pinned so other slider states never evict it
+    default_ranges = (min_date3, max_date3, pd.Timestamp(min_date4), pd.Timestamp(max_date4),
+                      min_date5, max_date5)
+    if not brand_jobs.submitted(vehicles_key(*default_ranges)):
+        brand_jobs.submit(vehicles_key(*default_ranges), date_grid_days, job_source,
+                          popularity.brand_rows(MODEL_FLOOR, vehicle_positions(*default_ranges)),
+                          pin=True)
+
+    # range_ts is already a tuple of datetime objects, no need to convert with unit="s"
+    start_range3, end_range3 = range_ts3
+    start_range4, end_range4 = range_ts4
+    start_range4 = pd.Timestamp(start_range4)
+    end_range4 = pd.Timestamp(end_range4)
+    start_range5, end_range5 = range_ts5
+    #start_range6, end_range6 = range_ts6
+    
+    # -------------------------
+    # 3️⃣ Filter and Pivot
+    # -------------------------
+    # Filter DataFrame using the slider values
+    
+    with span("filter", "vehicles_index"):
+        positions = vehicle_positions(start_range3, end_range3, start_range4, end_range4,
+                                      start_range5, end_range5)
+        filtered_df2 = df_faainal.take(positions)
+
+        # Brands/models removed by the filters should not show up as empty
+        # categories in the plots
+        for col in ["merk", "handelsbenaming"]:
+            filtered_df2[col] = filtered_df2[col].cat.remove_unused_categories()
+        
+
+################################################
+#boxplot    
+    # Charts are cached as images per dataset version and slider state
+    chart_key = vehicles_key(start_range3, end_range3, start_range4, end_range4,
+                             start_range5, end_range5)
+
+    def draw_boxplot():
+        fig2, ax2 = plt.subplots(figsize=(15, 12))
+        if streaming:
+            weighted_boxplot(filtered_df2, "merk", "maximale_constructiesnelheid", "aantal", ax=ax2)
+        else:
+            sns.boxplot(
+                data=filtered_df2,
+                x="merk",
+                y="maximale_constructiesnelheid"
+            )
+        plt.xticks(rotation=90)
+        plt.tight_layout()
+        return fig2
+
+    show_chart(("autos_boxplot",) + chart_key, draw_boxplot)
+
+
+######################################################
+#relplot    
+    def draw_relplot():
+        # Large selections are binned into an image, shaded by mean price
+        if len(filtered_df2) > RASTER_THRESHOLD:
+            fig, ax = plt.subplots(figsize=(7.5, 6))
+            rasterized_scatter(
+                filtered_df2["massa_rijklaar"],
+                filtered_df2["maximale_constructiesnelheid"],
+                ax=ax,
+                values=filtered_df2["catalogusprijs"],
+                weights=filtered_df2["aantal"] if streaming else None,
+                label="catalogusprijs"
+            )
+            ax.set_xlabel("massa_rijklaar")
+            ax.set_ylabel("maximale_constructiesnelheid")
+            return fig
+
+        g = sns.relplot(
+        x="massa_rijklaar",
+        y="maximale_constructiesnelheid",
+        hue="klasse_hybride_elektrisch_voertuig",
+        size="catalogusprijs",
+        sizes=(40, 400),
+        alpha=.5,
+        palette="muted",
+        height=6,
+        data=filtered_df2)
+        return g.fig  # ✅ use the figure behind the FacetGrid
+
+    if "massa_rijklaar" in filtered_df2.columns:
+        show_chart(("autos_relplot",) + chart_key, draw_relplot)
+    else:
+        st.info("Deze dataset heeft geen massa_rijklaar; de spreidingsgrafiek wordt overgeslagen.")
+
+
+
+##################################################
+#auto specifiek#   
+    selected_brand = st.selectbox(
+    "Selecteer een automerk",
+    filtered_df2["merk"].unique())
+
+    model_threshold = st.slider(
+        "Minimaal aantal voertuigen per model",
+        min_value=MODEL_FLOOR,
+        max_value=500,
+        value=MODEL_THRESHOLD,
+        step=10
+    )
+
+    sns.set_theme()
+
+    # Per-model counts, KDEs and model x jaar counts: looked up from the
+    # background jobs, computed here only for slider states not submitted.
+    # The threshold only selects models from it.
+    with span("aggregate", "brand_jobs"):
+        artifact = select_models(brand_jobs.result(
+            chart_key, selected_brand, date_grid_days,
+            lambda: brand_inputs(job_inputs, popularity.popular_rows(selected_brand, MODEL_FLOOR, positions))
+        ), model_threshold)
+###################
+#displot 
+    brand_key = chart_key + (selected_brand, model_threshold)
+
+    def draw_displot():
+        models = artifact["models"]
+        fig, ax = plt.subplots(figsize=(7.5, 6))
+        if len(artifact["grid"]):
+            ax.stackplot(
+                pd.to_datetime(artifact["grid"], unit="D"),
+                artifact["fractions"],
+                labels=models,
+                colors=sns.color_palette("hsv", len(models)),
+                alpha=.75
+            )
+            ax.legend(title="handelsbenaming", loc="center left", bbox_to_anchor=(1, 0.5), frameon=False)
+        ax.set_ylim(0, 1)
+        ax.set_xlabel("datum_eerste_toelating")
+        ax.set_ylabel("Density")
+        fig.tight_layout()
+        return fig
+
+    show_chart(("autos_displot",) + brand_key, draw_displot)
+ ######################
+ #heatmap   Pivot with aggregation
+    def draw_heatmap():
+        flights = artifact["table"]
+        
+        # Create figure and heatmap
+        f, ax = plt.subplots(figsize=(9, 6))
+        if not flights.empty:
+            sns.heatmap(flights, annot=True, fmt=".0f", linewidths=.5, cmap="YlGnBu", ax=ax)
+        return f
+    
+    # ✅ Show in Streamlit
+    show_chart(("autos_heatmap",) + brand_key, draw_heatmap)
@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from charts import RASTER_THRESHOLD, rasterized_scatter
+from data_loader import load_sessions, table_version
+from profiling import span
+from range_index import SortedRangeIndex
+from session_feed import REFRESH_SECONDS, SessionFeed, session_cube, use_feed
+from sessions import month_label, validation_report
+from views import show_chart
+
+# Laadpaaldata view: charging sessions as a month heatmap and a scatter
+# of occupancy over time.
+
+# Wattage slider step, also the bin width of the Laadpaaldata count cube
+WATT_STEP = 50
+
+
+def show():
+    st.markdown(
+        """
+        <style>
+        .block-container {
+            max-width: 1200px;
+            padding-left: 2rem;
+            padding-right: 2rem;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True
+    )
+    
+    st.title('Laadpaaldata dashboard')
+
+    # Chart libraries are only needed by the chart views
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_theme()
+    
+    @st.cache_resource(max_entries=2)
+    def sessions_index(version):
+        return SortedRangeIndex(load_sessions(), ["Maxgevraagd(w)", "hour"])
+
+    # Months are integer indices from Started, any number of years
+    @st.cache_resource(max_entries=2)
+    def sessions_cube(version):
+        return session_cube(load_sessions(), WATT_STEP)
+
+    # Live export (session_feed.py): only appended sessions are parsed and
+    # merged into the chunked sessions, cube and hour counts
+    @st.cache_resource
+    def session_feed():
+        return SessionFeed(".", WATT_STEP)
+
+    if use_feed():
+        feed = session_feed()
+
+        # A batch that cannot be read stays unread and is retried on the
+        # next poll; the page keeps the sessions it already has
+        with span("load", "session_feed"):
+            try:
+                feed.refresh()
+            except (OSError, ValueError):
+                pass  # reported by follow_feed, which runs right away
+        sessions_version, fd3, cube, hours = feed.snapshot()
+        filter_sessions = fd3.filter
+
+        # Poll the file; a full rerun only when new sessions arrived
+        @st.fragment(run_every=REFRESH_SECONDS)
+        def follow_feed(seen):
+            try:
+                feed.refresh()
+            except (OSError, ValueError) as exc:
+                st.warning(f"Nieuwe laadsessies konden niet worden ingelezen: {exc}")
+            if feed.version != seen:
+                st.rerun()
+            stats = feed.stats
+            update = "volledig geladen" if stats["mode"] == "rebuild" else f"{stats['rows']} nieuw"
+            st.caption(f"Live: {len(fd3)} sessies tot {feed.mark:%d-%m-%Y %H:%M}, "
+                       f"laatste update: {update} in {stats['seconds'] * 1000:.0f} ms")
+
+        follow_feed(sessions_version)
+    else:
+        # Typed frame (parsed dates, decimal commas, no NaT), cached per process
+        with span("load", "sessions"):
+            fd3 = load_sessions()
+        sessions_version = table_version("sessions")
+        cube = sessions_cube(sessions_version)
+        hours = None
+        index = sessions_index(sessions_version)
+
+        def filter_sessions(ranges, open_upper=()):
+            return index.filter(fd3, ranges, open_upper)
+    
+    # -------------------------
+    # 2️⃣ Slider Logic
+    # -------------------------
+    # Get min and max as Timestamp objects directly from the datetime columns
+    # Wattage slider moves over the cube's bin edges (start inclusive, end exclusive)
+    min_date = int(cube.edges["Maxgevraagd(w)"][0])
+    max_date = int(cube.edges["Maxgevraagd(w)"][-1])
+    
+    if hours is not None:
+        min_date2, max_date2 = np.flatnonzero(hours)[[0, -1]]
+    else:
+        min_date2 = fd3["hour"].min()
+        max_date2 = fd3["hour"].max()
+    
+    # Use the datetime objects directly in the slider
+    range_ts = st.slider(
+        "Selecteer minimale tot maximale stroomtoevoer van laadpaal (w)",
+        min_value=min_date, #to_pydatetime()
+        max_value=max_date, #to_pydatetime() 
+        value=(min_date, max_date),
+        step=WATT_STEP
+        #format="DD-MM-YYYY"
+    )
+    range_ts2 = st.slider(
+        "Selecteer tijdstip start laden",
+        min_value=int(min_date2),
+        max_value=int(max_date2),
+        value=(int(min_date2), int(max_date2)),
+        step=1,
+        format="%d uur"
+    )
+    
+    
+    # range_ts is already a tuple of datetime objects, no need to convert with unit="s"
+    start_range, end_range = range_ts
+    start_range2, end_range2 = range_ts2
+
+    
+    with span("filter", "sessions_index"):
+        filtered_df = filter_sessions({
+            "Maxgevraagd(w)": (start_range, end_range),
+            "hour": (start_range2, end_range2)}, open_upper=["Maxgevraagd(w)"])
+    
+    report = validation_report(fd3)
+    if report.values.any():
+        with st.expander("Datakwaliteit: gerepareerde en ongeldige waarden"):
+            st.dataframe(report[report.any(axis=1)])
+
+    st.write(
+        f"Showing {len(filtered_df)} rows | "
+        f"Wattage: {start_range}–{end_range} | "
+        f"Hour: {start_range2}–{end_range2}"
+    )
+    
+    #st.subheader('Bezettingsgraad (%) versus maand')
+    
+    # Charts are cached as images per dataset version and slider state
+    chart_key = (sessions_version, start_range, end_range, start_range2, end_range2)
+
+    def draw_heatmap():
+        # Generate Heatmap from the pre-aggregated cube; empty cells stay blank
+        with span("aggregate", "sessions_cube"):
+            flights = cube.query({
+                "hour": (start_range2, end_range2 + 1),
+                "Maxgevraagd(w)": (start_range, end_range)})
+        flights = flights.where(flights > 0)
+        flights.columns = pd.Index([month_label(m) for m in flights.columns], name="Maandjaar")
+        
+        fig, ax = plt.subplots(figsize=(12, 6), dpi=150)
+        sns.heatmap(flights, annot=True, fmt=".0f", linewidths=.5, cmap="YlGnBu", ax=ax)
+
+        ax.set_title("Bezettingsgraad (%) versus maand")
+        return fig
+    
+    show_chart(("laadpaal_heatmap",) + chart_key, draw_heatmap)
+
+
+##
+    def draw_scatter():
+        # Columns are already numeric/datetime (cleaned at load time); drop
+        # values the validation blanked out
+        df_plot = filtered_df.dropna(subset=["Started", "Bezettingsgraad", "Verbruikte energie WH accuraat"])
+        
+        # --- PLOTTING PHASE ---
+        # Create a brand new figure and axis object
+        fig_scatter, ax_scatter = plt.subplots(figsize=(12, 6), dpi=150)
+        
+        # Set the style to ensure the grid is visible
+        sns.set_style("whitegrid")
+        
+        # Large selections are binned into an image instead of one marker per session
+        raster = len(df_plot) > RASTER_THRESHOLD
+        if raster:
+            rasterized_scatter(
+                df_plot["Started"],
+                df_plot["Bezettingsgraad"],
+                ax=ax_scatter,
+                values=df_plot["Verbruikte energie WH accuraat"],
+                label="Verbruikte energie WH accuraat"
+            )
+        else:
+            sns.scatterplot(
+                data=df_plot,
+                x="Started",
+                y="Bezettingsgraad",
+                hue="Verbruikte energie WH accuraat",
+                size="Verbruikte energie WH accuraat",
+                palette="viridis", # Using a standard palette first to ensure it works
+                sizes=(20, 200),
+                ax=ax_scatter
+            )
+
+        #y as aanpassen
+        ax_scatter.set_ylim(-2, 102)
+        
+        #y as afstand 
+        ax_scatter.set_yticks(range(0, 101, 10))
+
+        ax_scatter.set_title("Bezetting over Tijd")
+        ax_scatter.set_ylabel("Bezettingsgraad (%)")
+        
+        # legenda verplaatsen
+        if not raster:
+            sns.move_legend(ax_scatter, "lower center", bbox_to_anchor=(0.5, -0.3), ncol=4)
+        return fig_scatter
+    
+    show_chart(("laadpaal_scatter",) + chart_key, draw_scatter)
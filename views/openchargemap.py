@@ -0,0 +1,141 @@
+import numpy as np
+import streamlit as st
+
+from choropleth import choropleth_layer
+from clustering import ClusterIndex, bounds_from_st_folium, cluster_radius
+from data_loader import load_openchargemap, openchargemap_version
+from markers import marker_layer
+from profiling import span
+from range_index import SortedRangeIndex
+from spatial_join import MunicipalityJoin
+
+# Openchargemap view: chargers and municipalities on a folium map.
+
+# (south, west, north, east) of the Netherlands, the initial map viewport
+NL_BOUNDS = (50.7, 3.3, 53.6, 7.3)
+
+
+def show():
+    st.title("⚡ Openchargemap Dashboard")
+
+    # Map libraries are only needed by this view
+    import folium
+    from streamlit_folium import st_folium
+    
+    # Parsed once per process, reloaded only when the CSVs change
+    with span("load", "openchargemap"):
+        df_muni, gdf_points, gdf_munis = load_openchargemap()
+
+    min_date10 = gdf_points["Conn_PowerKW"].min()
+    max_date10 = gdf_points["Conn_PowerKW"].max()
+    
+    range_ts10 = st.slider(
+        "Selecteer minmale en maximale stroomtoevoer",
+        min_value=min_date10, #to_pydatetime()
+        max_value=max_date10, #to_pydatetime() 
+        value=(min_date10, max_date10))
+    
+    start_range10, end_range10 = range_ts10
+        
+    # Sorted-column index over the slider columns, built once per dataset
+    @st.cache_resource(max_entries=2)
+    def points_index(version):
+        return SortedRangeIndex(load_openchargemap().gdf_points, ["Conn_PowerKW"])
+
+    power_range = {"Conn_PowerKW": (start_range10, end_range10)}
+    with span("filter", "points_index"):
+        positions = points_index(openchargemap_version()).positions(power_range)
+        gdf_points = gdf_points.take(positions).reset_index(drop=True)
+
+    # Chargers joined to the municipalities once per dataset
+    # (spatial_join.py); the choropleth aggregates the slider selection
+    @st.cache_resource(max_entries=2)
+    def municipality_join(version):
+        data = load_openchargemap()
+        return MunicipalityJoin(data.gdf_points, data.gdf_munis)
+
+    with span("aggregate", "municipalities"):
+        muni_stats = municipality_join(openchargemap_version()).aggregate(positions)
+
+    unmatched = df_muni.attrs.get("unmatched")
+    if unmatched:
+        with st.expander(f"⚠️ {len(unmatched)} gemeentenamen in df_muni.csv niet gekoppeld"):
+            st.dataframe(unmatched)
+
+    # Cluster index per power range, shared by all sessions
+    @st.cache_resource(max_entries=16)
+    def build_cluster_index(version, start, end):
+        points = points_index(version).filter(
+            load_openchargemap().gdf_points, {"Conn_PowerKW": (start, end)})
+        return ClusterIndex(points["AddressInfo.Latitude"], points["AddressInfo.Longitude"])
+
+    with span("aggregate", "cluster_index"):
+        cluster_index = build_cluster_index(openchargemap_version(), start_range10, end_range10)
+
+    # Last viewport reported by the map, used to cluster only what is in view
+    view = st.session_state.setdefault(
+        "ocm_view", {"center": [52.1, 5.3], "zoom": 8, "bounds": NL_BOUNDS})
+    
+    with span("render", "folium"):
+        # Base map
+        m = folium.Map(location=[52.1, 5.3], zoom_start=8)
+
+        # Choropleth layer: the aggregates are embedded per GID_2 in the
+        # outlines pre-simplified for this zoom; municipalities without
+        # chargers in the selected range stay grey
+        choropleth, legend = choropleth_layer(
+            muni_stats.round({"avg_power": 1, "max_power": 1, "dc_share": 2}),
+            "avg_power",
+            view["zoom"],
+            tooltip={"NAME_2": "Gemeente", "chargers": "Laadpunten", "avg_power": "Gem. vermogen (kW)",
+                     "max_power": "Max. vermogen (kW)", "dc_share": "Aandeel DC"})
+        choropleth.add_to(m)
+        legend.add_to(m)
+
+        # Clustered markers for the current viewport only
+        markers = folium.FeatureGroup(name="Laadpalen")
+        with span("aggregate", "clusters"):
+            clusters = cluster_index.query(view["bounds"], view["zoom"])
+            radii = cluster_radius(clusters["count"])
+
+        clustered = clusters["point"] < 0
+        for lat, lon, count, radius in zip(
+                clusters["lat"][clustered], clusters["lon"][clustered],
+                clusters["count"][clustered], radii[clustered]):
+            folium.CircleMarker(
+                location=[lat, lon],
+                radius=float(radius),
+                color="#3186cc",
+                fill=True,
+                fill_opacity=0.6,
+                tooltip=f"{count} laadpunten"
+            ).add_to(markers)
+
+        # Lone chargers: tooltips/popups built column-wise into one GeoJSON layer
+        marker_layer(gdf_points.take(clusters["point"][~clustered])).add_to(markers)
+    
+    # Display the map in Streamlit; markers are sent as a separate layer so
+    # panning does not re-render the base map
+    with span("serialize", "st_folium"):
+        map_state = st_folium(
+            m,
+            width=1400,
+            height=600,
+            key="ocm_map",
+            center=view["center"],
+            zoom=view["zoom"],
+            feature_group_to_add=markers,
+            returned_objects=["bounds", "zoom", "center"]
+        )
+
+    if map_state and map_state.get("zoom") is not None:
+        center = map_state.get("center") or {}
+        new_view = {
+            "center": [center.get("lat", view["center"][0]), center.get("lng", view["center"][1])],
+            "zoom": map_state["zoom"],
+            "bounds": bounds_from_st_folium(map_state.get("bounds"), view["bounds"]),
+        }
+        if (new_view["zoom"] != view["zoom"]
+                or np.round(new_view["bounds"], 4).tolist() != np.round(view["bounds"], 4).tolist()):
+            st.session_state["ocm_view"] = new_view
+            st.rerun()